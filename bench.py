@@ -0,0 +1,244 @@
+import os
+os.environ.setdefault('BETA_TOKEN', 'bench')
+os.environ.setdefault('DB_PASSWORD', 'bench')
+
+import logging
+logging.disable(logging.INFO)
+
+import json
+import random
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from scurrypy.api import EmojiModel
+
+import main
+from game import Card, CardEvent, Cards, Hand, Player, RANKS, SUITS
+from game.custom_ids import SELECT, session_token
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'bench_baseline.json')
+EMOJI_NAMES = [
+    'acorn', 'flaming_acorn', 'frozen_acorn', 'corrupt_acorn', 'heart', 'empty_heart',
+    'broken_heart', 'space', 'stash', 'highscore', 'bullet'
+]
+
+# runs below this long are repeated so timer noise stays small
+MIN_RUN_TIME = 0.2
+ALLOC_SAMPLES = 500
+
+def stub_emojis():
+    main.app_emojis.emojis = {
+        name: EmojiModel(name, id=1_000_000 + i)
+        for i, name in enumerate(EMOJI_NAMES)
+    }
+
+    main.build_render_cache()
+
+def make_ctx():
+    return SimpleNamespace(user=SimpleNamespace(id=1234567890, username='bench', avatar='avatar'))
+
+def make_player():
+    p = Player(1234567890, 'e0ba2f14-4c5e-4b6e-9d4c-4f2b0a7c1f3e', score=1450, highscore=2210, hp=2)
+    p.hand = Hand([Card('GL', '4'), Card('SP', '7'), Card('GL', 'A')])
+    p.new_options()
+
+    return p
+
+def bench_add_card():
+    p = make_player()
+    cards = [Card(random.choice(SUITS), random.choice(RANKS)) for _ in range(256)]
+
+    def run(i):
+        p.add_card(cards[i & 255])
+
+        if p.hand.total > 21:
+            p.hand.clear()
+
+    return run
+
+def bench_new_options():
+    p = make_player()
+
+    # the handlers' path, each move draws from its slot of the session's block
+    return lambda i: p.new_options(main.streams.get(p.session_id, i))
+
+def bench_check_21():
+    hand = Hand([Card('GL', '4'), Card('SP', '7')])
+    card = Card('DG', '9')
+
+    return lambda i: CardEvent().check_21(hand, card)
+
+def bench_check_21_stash():
+    cards = [Card('GL', '4'), Card('GL', '7')]
+    card = Card('GL', '10')
+
+    # a stash clears the hand, so each run starts from a fresh one
+    return lambda i: CardEvent().check_21(Hand(cards), card)
+
+def bench_check_match():
+    cards = [Card('GL', '4'), Card('SP', '7'), Card('DG', '2')]
+    card = Card('LA', '3')
+
+    return lambda i: CardEvent().check_match(Hand(cards), card)
+
+def bench_check_match_hit():
+    cards = [Card('GL', '4'), Card('SP', '7'), Card('DG', '2')]
+    card = Card('SP', '7')
+
+    return lambda i: CardEvent().check_match(Hand(cards), card)
+
+def bench_cards():
+    cards = [Card('GL', '4'), Card('SP', '7'), Card('GL', 'A'), Card('DG', '10')]
+
+    def run(i):
+        Cards.sum_cards(cards)
+        Cards.all_one_suit(cards)
+        Cards.get_next_card(cards, cards[-1])
+        Cards.get_highest_card(cards)
+
+    return run
+
+def bench_card_str():
+    fmts = [c.to_str() for c in make_player().options + [Card('GL', '10'), Card('HP', '+1')]]
+
+    return lambda i: [Card.to_card(f).to_str() for f in fmts]
+
+def bench_card_pack():
+    hand = list(make_player().hand)
+
+    return lambda i: Card.unpack(Card.pack(hand))
+
+def bench_custom_id():
+    p = make_player()
+
+    def run(i):
+        custom_id = main.codec.encode(SELECT, p.user_id, session_token(p.session_id), Card.pack(p.options), p.move_seq, i % 3)
+        main.router.route(custom_id)
+
+    return run
+
+def bench_game_embed():
+    ctx, p = make_ctx(), make_player()
+
+    def run(i):
+        main.build_game_embed(ctx, p, 42).to_dict()
+        main.build_player_options(p).to_dict()
+
+    return run
+
+def bench_help_message():
+    ctx = make_ctx()
+
+    return lambda i: main.build_help_message(ctx, i % main.GAME_HELP_SIZE).to_dict()
+
+BENCHMARKS = {
+    'player.add_card': bench_add_card,
+    'player.new_options': bench_new_options,
+    'card_event.check_21': bench_check_21,
+    'card_event.check_21_stash': bench_check_21_stash,
+    'card_event.check_match': bench_check_match,
+    'card_event.check_match_hit': bench_check_match_hit,
+    'cards.helpers': bench_cards,
+    'card.to_card/to_str': bench_card_str,
+    'card.pack/unpack': bench_card_pack,
+    'custom_id.encode/route': bench_custom_id,
+    'render.game_embed': bench_game_embed,
+    'render.help_message': bench_help_message,
+}
+
+def measure(factory):
+    random.seed(0)
+    run = factory()
+
+    loops = 1
+
+    while True:
+        start = time.perf_counter()
+
+        for i in range(loops):
+            run(i)
+
+        elapsed = time.perf_counter() - start
+
+        if elapsed >= MIN_RUN_TIME:
+            break
+
+        loops *= 2
+
+    # allocation figures come from a separate, traced pass so they don't skew timings
+    tracemalloc.start()
+    peak_total = 0
+
+    for i in range(ALLOC_SAMPLES):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+
+        run(i)
+
+        _, peak = tracemalloc.get_traced_memory()
+        peak_total += peak - base
+
+    tracemalloc.stop()
+
+    return {
+        'ops_per_sec': loops / elapsed,
+        'peak_bytes_per_op': peak_total / ALLOC_SAMPLES
+    }
+
+def main_bench(names: list[str], save: bool, threshold: float):
+    stub_emojis()
+
+    baseline = {}
+
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+
+    print(f"{'benchmark':<26} {'ops/sec':>12} {'baseline':>12} {'change':>8} {'peak B/op':>10}")
+
+    for name in names:
+        result = results[name] = measure(BENCHMARKS[name])
+
+        base = baseline.get(name, {}).get('ops_per_sec')
+        change = (result['ops_per_sec'] / base - 1) if base else None
+
+        if change is not None and change < -threshold:
+            regressions.append(name)
+
+        print(
+            f"{name:<26} {result['ops_per_sec']:>12,.0f} "
+            + (f"{base:>12,.0f} {change:>+8.1%}" if base else f"{'-':>12} {'-':>8}")
+            + f" {result['peak_bytes_per_op']:>10,.0f}"
+        )
+
+    if save:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump({**baseline, **results}, f, indent=4)
+
+        print(f"\nSaved baseline to {BASELINE_PATH}")
+
+    if regressions:
+        print(f"\nRegressed more than {threshold:.0%}: {', '.join(regressions)}")
+
+    return 1 if regressions and not save else 0
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the per-click game and render paths.")
+    parser.add_argument('names', nargs='*', help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--save', action='store_true', help="record these results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.15, help="slowdown versus baseline that counts as a regression")
+
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    raise SystemExit(main_bench(args.names or list(BENCHMARKS), args.save, args.threshold))
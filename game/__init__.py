@@ -3,6 +3,15 @@
 from .player import Player, MAX_HEALTH, OPTIONS_SIZE
 from .card import Card, RANKS, SUITS, FACES
 from .db import PostgresDB
+from .player_cache import PlayerCache
 from .cards import Cards
+from .hand import Hand
 from .card_event import CardEvent
-from .leaderboard import Leaderboard, LeaderboardEntry
+from .targets import TargetPool
+from .engine import SelectResult
+from .leaderboard import Leaderboard, LeaderboardEntry, LeaderboardPage, LeaderboardSummary
+from .sessions import SessionMap
+from .clicks import ClickRegistry
+from .tasks import TaskQueue
+from .rng import RandomStream, RandomStreams
+from .custom_ids import CustomId, CustomIdCodec, ComponentRouter
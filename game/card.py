@@ -1,51 +1,90 @@
 import random
-from dataclasses import dataclass
 
 RANKS = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10']
 FACES = ['B', 'P', 'W']
 SUITS = ['GL', 'SP', 'DG', 'LA']
 
-@dataclass
+# packed cards are one byte each: suit index * 13 + rank index, with hearts reserved
+HP_CODE = 0xFF
+
+EMOJI_NAMES = {
+    'GL': 'acorn',
+    'SP': 'flaming_acorn',
+    'DG': 'frozen_acorn',
+    'LA': 'corrupt_acorn',
+    'HP': 'heart'
+}
+
 class Card:
-    suit: str
-    rank: str
-
-    @property
-    def value(self):
-        if self.rank in ['B', 'P', 'W']:
-            return 10
-        elif self.rank == 'A':
-            return 1
+    # every card is interned at import, so Card(suit, rank) returns a shared immutable instance
+    __slots__ = ('suit', 'rank', 'value', 'emoji_name', 'code', 'text')
+
+    def __new__(cls, suit: str, rank: str):
+        return CARDS[suit, rank]
+
+    @classmethod
+    def _create(cls, suit: str, rank: str, code: int):
+        card = object.__new__(cls)
+
+        if rank in FACES:
+            value = 10
+        elif rank == 'A':
+            value = 1
         else:
-            return int(self.rank)
-        
-    @property
-    def emoji_name(self):
-        match self.suit:
-            case 'GL':
-                return 'acorn'
-            case 'SP':
-                return 'flaming_acorn'
-            case 'DG':
-                return 'frozen_acorn'
-            case 'LA':
-                return 'corrupt_acorn'
-            case 'HP':
-                return 'heart'
-    
+            value = int(rank)
+
+        for attr, attr_value in zip(cls.__slots__, (suit, rank, value, EMOJI_NAMES[suit], code, f"{suit}.{rank}")):
+            object.__setattr__(card, attr, attr_value)
+
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Card is immutable, cannot set '{name}'")
+
+    def __repr__(self):
+        return f"Card(suit={self.suit!r}, rank={self.rank!r})"
+
+    def __reduce__(self):
+        return (Card, (self.suit, self.rank))
+
     @staticmethod
     def random():
-        return Card(random.choice(SUITS), random.choice(RANKS + FACES))
+        return random.choice(DRAW_CARDS)
     
     @staticmethod
     def random_rank():
-        return Card(random.choice(SUITS), random.choice(RANKS))
+        return random.choice(RANK_CARDS)
     
     @staticmethod
     def to_card(card_fmt: str):
-        suit, rank = card_fmt.split('.')
-
-        return Card(suit, rank)
+        return CARDS_BY_STR[card_fmt]
 
     def to_str(self):
-        return f"{self.suit}.{self.rank}"  
+        return self.text
+
+    @staticmethod
+    def pack(cards: list['Card']):
+        return bytes(c.code for c in cards)
+
+    @staticmethod
+    def from_code(code: int):
+        return CARDS_BY_CODE[code]
+
+    @staticmethod
+    def unpack(data: bytes):
+        return [CARDS_BY_CODE[code] for code in data]
+
+CARDS: dict[tuple[str, str], Card] = {
+    (suit, rank): Card._create(suit, rank, s * len(RANKS + FACES) + r)
+    for s, suit in enumerate(SUITS)
+    for r, rank in enumerate(RANKS + FACES)
+}
+CARDS['HP', '+1'] = Card._create('HP', '+1', HP_CODE)
+
+RANK_VALUES = {rank: CARDS[SUITS[0], rank].value for rank in RANKS + FACES}
+
+CARDS_BY_STR = {c.text: c for c in CARDS.values()}
+CARDS_BY_CODE = {c.code: c for c in CARDS.values()}
+
+DRAW_CARDS = [c for c in CARDS.values() if c.suit in SUITS]
+RANK_CARDS = [c for c in DRAW_CARDS if c.rank in RANKS]
@@ -2,6 +2,7 @@ from dataclasses import dataclass
 
 from .card import Card
 from .cards import Cards
+from .hand import Hand
 
 @dataclass
 class CardEvent:
@@ -11,26 +12,24 @@ class CardEvent:
     is_match: bool = False
     is_stash: bool = False
 
-    def check_21(self, cards: list[Card], card: Card):
-        p_cards = cards + [card] if card else cards
-
-        self.is_stash = Cards.sum_cards(p_cards) == 21
+    def check_21(self, cards: Hand, card: Card):
+        self.is_stash = cards.total + (card.value if card else 0) == 21
 
         if self.is_stash:
-            self.stash_suit = Cards.all_one_suit(p_cards)
+            self.stash_suit = cards.one_suit(card)
             self.points += 500 if self.stash_suit else 100
 
             cards.clear()
         
         return cards
 
-    def check_match(self, cards: list[Card], card: Card):
-        self.is_match = card.rank in [c.rank for c in cards]
+    def check_match(self, cards: Hand, card: Card):
+        self.is_match = cards.has_rank(card.rank)
 
         add_pts = 0
 
         if self.is_match:
-            matching_card = Cards.get_next_card(cards, card)
+            matching_card = cards.find_rank(card.rank)
 
             add_pts = 2 * card.value
             self.match_suit = Cards.all_one_suit([matching_card, card])
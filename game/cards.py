@@ -3,8 +3,7 @@ from .card import Card
 class Cards:
     @staticmethod
     def sum_cards(cards: list[Card]):
-        from functools import reduce
-        return reduce(lambda x, y: x + y, [c.value for c in cards], 0)
+        return sum(c.value for c in cards)
 
     @staticmethod
     def all_one_suit(cards: list[Card]):
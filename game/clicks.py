@@ -0,0 +1,70 @@
+import asyncio
+import functools
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from scurrypy.api.messages import MessagePart
+
+from .custom_ids import CustomId
+from .metrics import METRICS
+
+REPLIES_SIZE = 10_000
+
+# one click per user at a time, and a repeat of the click just handled gets the same reply instead of a second move
+class ClickRegistry:
+    def __init__(self, max_size: int = REPLIES_SIZE):
+        self.max_size = max_size
+
+        # user_id -> [lock, clicks holding or waiting for it], dropped once nobody waits
+        self.locks: dict[int, list] = {}
+
+        # user_id -> (last handled click, its reply), least recently used first
+        self.replies: OrderedDict[int, tuple[CustomId, MessagePart]] = OrderedDict()
+        self.replayed = 0
+
+        METRICS.add_gauge('clicks_in_flight', lambda: len(self.locks))
+        METRICS.add_gauge('clicks_replayed', lambda: self.replayed)
+
+    @asynccontextmanager
+    async def hold(self, user_id: int):
+        entry = self.locks.get(user_id)
+
+        if entry is None:
+            entry = self.locks[user_id] = [asyncio.Lock(), 0]
+
+        entry[1] += 1
+
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+
+            if not entry[1]:
+                del self.locks[user_id]
+
+    def serialize(self, handler):
+        @functools.wraps(handler)
+        async def wrapper(ctx, cid: CustomId):
+            async with self.hold(ctx.user.id):
+                await handler(ctx, cid)
+
+        return wrapper
+
+    def replay(self, user_id: int, cid: CustomId):
+        # only the latest click is kept, so an older repeat falls through to the stale checks
+        last = self.replies.get(user_id)
+
+        if last is None or last[0] != cid:
+            return None
+
+        self.replayed += 1
+
+        return last[1]
+
+    def remember(self, user_id: int, cid: CustomId, reply: MessagePart):
+        self.replies[user_id] = (cid, reply)
+        self.replies.move_to_end(user_id)
+
+        if len(self.replies) > self.max_size:
+            self.replies.popitem(last=False)
@@ -0,0 +1,145 @@
+import logging
+
+logger = logging.getLogger('scurrypy')
+
+from scurrypy.ext.components import ComponentsAddon, MessageComponentContext
+
+import base64
+import hashlib
+import hmac
+import struct
+import uuid
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from .player import OPTIONS_SIZE
+
+VERSION = 1
+
+TOKEN_SIZE = 8
+SIGNATURE_SIZE = 8
+NO_SESSION = bytes(TOKEN_SIZE)
+
+# version, opcode, user id, session token, then the opcode's args
+HEADER_FORMAT = '>BBQ8s'
+
+START = 0
+SELECT = 1
+RESTART = 2
+HELP_FIRST = 3
+HELP_BACK = 4
+HELP_NEXT = 5
+HELP_LAST = 6
+LB_FIRST = 7
+LB_BACK = 8
+LB_NEXT = 9
+LB_LAST = 10
+
+# opcode -> struct format of its args, a message's buttons need distinct ids so each button kind has its own opcode
+ARG_FORMATS = {
+    START: '8s', # the session uuid's last 8 bytes, the token holds the first 8
+    # packed options the button was dealt with, the move_seq it was rendered at so a repeat deal still has a new id, option index
+    SELECT: f'{OPTIONS_SIZE}sQB',
+    RESTART: f'{OPTIONS_SIZE}sQ',
+    HELP_FIRST: 'b', # page number
+    HELP_BACK: 'b',
+    HELP_NEXT: 'b',
+    HELP_LAST: 'b',
+    LB_FIRST: '',
+    LB_BACK: 'qQ', # (best_score, user_id) cursor
+    LB_NEXT: 'qQ',
+    LB_LAST: '',
+}
+
+def session_token(session_id: str):
+    # rows that never started a session hold a placeholder like '0'
+    try:
+        return uuid.UUID(session_id).bytes[:TOKEN_SIZE]
+    except (TypeError, ValueError):
+        return NO_SESSION
+
+@dataclass(slots=True)
+class CustomId:
+    opcode: int
+    user_id: int
+    session: bytes
+    args: tuple
+
+class CustomIdCodec:
+    """Packs component custom ids into a fixed binary layout per opcode, base64url encoded and optionally signed."""
+
+    def __init__(self, secret: bytes = None):
+        self.secret = secret
+
+        # indexed by opcode
+        self.layouts = [struct.Struct(HEADER_FORMAT + ARG_FORMATS[op]) for op in range(len(ARG_FORMATS))]
+
+    def sign(self, data: bytes):
+        return hmac.new(self.secret, data, hashlib.sha256).digest()[:SIGNATURE_SIZE]
+
+    def encode(self, opcode: int, user_id: int, session: bytes = NO_SESSION, *args):
+        data = self.layouts[opcode].pack(VERSION, opcode, user_id, session, *args)
+
+        if self.secret:
+            data += self.sign(data)
+
+        return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+    def decode(self, custom_id: str):
+        """Unpack a custom id, returns None for anything this version didn't encode."""
+        try:
+            data = base64.urlsafe_b64decode(custom_id + '=' * (-len(custom_id) % 4))
+        except ValueError:
+            return None
+
+        if self.secret:
+            data, signature = data[:-SIGNATURE_SIZE], data[-SIGNATURE_SIZE:]
+
+            if not hmac.compare_digest(signature, self.sign(data)):
+                return None
+
+        if len(data) < 2 or data[0] != VERSION or data[1] >= len(self.layouts):
+            return None
+
+        layout = self.layouts[data[1]]
+
+        if len(data) != layout.size:
+            return None
+
+        _, opcode, user_id, session, *args = layout.unpack(data)
+
+        return CustomId(opcode, user_id, session, tuple(args))
+
+ComponentHandler = Callable[[MessageComponentContext, CustomId], Awaitable[None]]
+
+# the addon only sees one catch-all pattern, so routing is a decode and a list index instead of an fnmatch scan
+class ComponentRouter:
+    def __init__(self, components: ComponentsAddon, codec: CustomIdCodec, on_invalid: Callable[[MessageComponentContext], Awaitable[None]]):
+        self.codec = codec
+        self.on_invalid = on_invalid
+
+        self.handlers: list[ComponentHandler] = [None] * len(ARG_FORMATS)
+
+        components.component('*', handler=self.dispatch)
+
+    def button(self, opcode: int):
+        def decorator(func: ComponentHandler):
+            self.handlers[opcode] = func
+            return func
+
+        return decorator
+
+    def route(self, custom_id: str):
+        cid = self.codec.decode(custom_id)
+
+        return (self.handlers[cid.opcode], cid) if cid else (None, None)
+
+    async def dispatch(self, ctx: MessageComponentContext):
+        handler, cid = self.route(ctx.data.custom_id)
+
+        if handler is None:
+            # buttons from before a format change or with a bad signature
+            await self.on_invalid(ctx)
+            return
+
+        await handler(ctx, cid)
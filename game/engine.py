@@ -0,0 +1,87 @@
+from dataclasses import dataclass, field
+
+from .card import Card
+from .card_event import CardEvent
+from .cards import Cards
+from .hand import Hand
+from .player import Player, MAX_HEALTH
+from .rng import RandomStream, SHARED_STREAM
+
+@dataclass
+class SelectResult:
+    card: Card
+    drawn: list[Card] = field(default_factory=list)
+    events: list[CardEvent] = field(default_factory=list)
+    stolen_from: int = None
+    busted: bool = False
+
+    @property
+    def points(self):
+        return sum(e.points for e in self.events)
+
+def cast_wizard(p: Player, wizard: Card):
+    highest_card = p.hand.highest()
+    p.hand.remove(highest_card)
+
+    e = CardEvent(points=2 * highest_card.value)
+
+    p.hand = e.check_21(p.hand, highest_card)
+
+    e.is_match = not e.is_stash and Cards.all_one_suit([wizard, highest_card])
+
+    if e.is_match:
+        e.match_suit = wizard.emoji_name
+        e.points *= 2
+
+    p.score += e.points
+
+    return e
+
+def select(p: Player, idx: int, stolen: Card = None, stolen_from: int = None, rng: RandomStream = SHARED_STREAM):
+    """Apply option `idx` to `p`, then deal new options.
+
+    The Pirate needs another player's state, so the caller steals beforehand and
+    passes the card in; without one the Pirate draws a random card. Every other
+    draw comes from `rng`, so a game replays exactly from its stream.
+    """
+    card = p.options[idx]
+    result = SelectResult(card)
+
+    if card.suit == 'HP':
+        p.hp += (1 if p.hp < MAX_HEALTH else 0)
+
+    elif card.rank == 'B':
+        result.drawn = rng.bookie()
+        result.events = [p.add_card(c) for c in result.drawn]
+
+    elif card.rank == 'P':
+        result.stolen_from = stolen_from if stolen else None
+        result.drawn = [stolen or rng.rank_card()]
+        result.events = [p.add_card(result.drawn[0])]
+
+    elif card.rank == 'W':
+        # a thief can empty the hand after the options were dealt, then the wizard has nothing to stash
+        result.events = [cast_wizard(p, card)] if p.hand else []
+
+    else:
+        result.events = [p.add_card(card)]
+
+    result.busted = p.hand.total > 21
+
+    if result.busted:
+        p.hp -= 1
+
+    p.new_options(rng)
+    p.move_seq += 1
+
+    return result
+
+def restart(p: Player, rng: RandomStream = SHARED_STREAM):
+    """Start `p` over in the same session, keeping the best score as the highscore."""
+    p.highscore = max(p.score, p.highscore)
+    p.score = 0
+    p.hp = MAX_HEALTH
+    p.hand = Hand()
+
+    p.new_options(rng)
+    p.move_seq += 1
@@ -0,0 +1,81 @@
+from .card import Card, RANK_VALUES
+
+class Hand:
+    # keeps a running sum and per-rank/per-suit counts so stash, match and bust checks are O(1)
+    __slots__ = ('cards', 'total', 'ranks', 'suits')
+
+    def __init__(self, cards: list[Card] = ()):
+        self.cards: list[Card] = []
+        self.total = 0
+        self.ranks: dict[str, int] = {}
+        self.suits: dict[str, int] = {}
+
+        for c in cards:
+            self.append(c)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def __getitem__(self, idx: int):
+        return self.cards[idx]
+
+    def __eq__(self, other):
+        return self.cards == (other.cards if isinstance(other, Hand) else other)
+
+    def __repr__(self):
+        return f"Hand({self.cards!r})"
+
+    def append(self, card: Card):
+        self.cards.append(card)
+
+        self.total += card.value
+        self.ranks[card.rank] = self.ranks.get(card.rank, 0) + 1
+        self.suits[card.suit] = self.suits.get(card.suit, 0) + 1
+
+    def _discard(self, card: Card):
+        self.total -= card.value
+
+        for counts, key in ((self.ranks, card.rank), (self.suits, card.suit)):
+            if counts[key] == 1:
+                del counts[key]
+            else:
+                counts[key] -= 1
+
+    def remove(self, card: Card):
+        self.cards.remove(card)
+        self._discard(card)
+
+    def pop(self, idx: int = -1):
+        card = self.cards.pop(idx)
+        self._discard(card)
+
+        return card
+
+    def clear(self):
+        self.cards.clear()
+
+        self.total = 0
+        self.ranks.clear()
+        self.suits.clear()
+
+    def has_rank(self, rank: str):
+        return rank in self.ranks
+
+    def find_rank(self, rank: str):
+        return next(c for c in self.cards if c.rank == rank)
+
+    def highest(self):
+        return self.find_rank(max(self.ranks, key=RANK_VALUES.__getitem__))
+
+    def one_suit(self, card: Card = None):
+        """Emoji name of the suit shared by every card in hand (and `card`), else `None`."""
+        if card and self.suits.get(card.suit, 0) != len(self.cards):
+            return None
+
+        if not card and len(self.suits) != 1:
+            return None
+
+        return card.emoji_name if card else self.cards[0].emoji_name
@@ -1,74 +1,207 @@
+import logging
+
+logger = logging.getLogger('scurrypy')
+
+from scurrypy import Client
+
+import asyncio
 import asyncpg
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 
+from .db import PostgresDB
+from .player import Player
+from .rank_index import RankIndex
+
 LB_SIZE = 3
 
+# pages are shared by everyone browsing a guild's leaderboard for this long
+PAGE_TTL = 5
+
+# seconds between full reloads when other processes also write players
+LEADERBOARD_REFRESH = 30
+
 @dataclass
 class LeaderboardEntry:
     rank: int
     user_id: int
     best_score: int
 
-class Leaderboard:
-    async def fetch(self, conn: asyncpg.Connection, guild_id: int):
-        q = await conn.fetch(
-            """
-                WITH leaderboard AS (
-                SELECT
-                    user_id,
-                    GREATEST(highscore, score) AS best_score,
-                    ROW_NUMBER() OVER (ORDER BY GREATEST(highscore, score) DESC) AS rank
-                FROM player
-                WHERE guild_id = $1
-                )
-                SELECT rank, user_id, best_score
-                FROM leaderboard
-                LIMIT $2
-            """, guild_id, LB_SIZE)
-        
-        return [LeaderboardEntry(rank, user_id, best_score) for rank, user_id, best_score in q]
-    
-    async def fetch_local_player(self, conn: asyncpg.Connection, guild_id: int, user_id: int):
-        leaderboard = await conn.fetchrow(
-            """
-                WITH leaderboard AS (
-                SELECT
-                    user_id,
-                    GREATEST(highscore, score) AS best_score,
-                    ROW_NUMBER() OVER (ORDER BY GREATEST(highscore, score) DESC) AS rank
-                FROM player
-                WHERE guild_id = $1
-                )
-                SELECT rank, user_id, best_score
-                FROM leaderboard
-                WHERE user_id = $2
-            """,
-            guild_id, user_id
-        )
+@dataclass
+class LeaderboardPage:
+    entries: list[LeaderboardEntry]
+    total: int
+
+    @property
+    def has_previous(self):
+        return bool(self.entries) and self.entries[0].rank > 1
+
+    @property
+    def has_next(self):
+        return bool(self.entries) and self.entries[-1].rank < self.total
+
+@dataclass
+class LeaderboardSummary:
+    entries: list[LeaderboardEntry]
+    local_player: LeaderboardEntry | bool
+    global_player: LeaderboardEntry | bool
+    page: LeaderboardPage = None
+
+class LeaderboardIndex:
+    def __init__(self):
+        self.global_ranks = RankIndex()
+        self.guild_ranks: dict[int, RankIndex] = {}
+
+        # user_id -> (guild_id, best_score) as last indexed
+        self.players: dict[int, tuple[int, int]] = {}
+
+    async def load(self, conn: asyncpg.Connection):
+        records = await conn.fetch("select user_id, guild_id, GREATEST(highscore, score) from player")
+
+        index = LeaderboardIndex()
+
+        for user_id, guild_id, best_score in records:
+            index.update(user_id, guild_id, best_score)
+
+        self.global_ranks, self.guild_ranks, self.players = index.global_ranks, index.guild_ranks, index.players
+
+    def update(self, user_id: int, guild_id: int, best_score: int):
+        current = self.players.get(user_id)
+
+        if current == (guild_id, best_score):
+            return
+
+        if current:
+            old_guild_id, old_score = current
+            self.global_ranks.remove((-old_score, user_id))
+            self.guild_ranks[old_guild_id].remove((-old_score, user_id))
+
+        self.players[user_id] = (guild_id, best_score)
+
+        self.global_ranks.insert((-best_score, user_id))
+        self.guild_ranks.setdefault(guild_id, RankIndex()).insert((-best_score, user_id))
+
+    def top(self, guild_id: int, size: int):
+        return self.page(guild_id, 'first', None, size).entries
+
+    def page(self, guild_id: int, direction: str, cursor: tuple[int, int] | None, size: int):
+        """Keyset page next to `cursor`, a (best_score, user_id) pair from the page being left."""
+        ranks = self.guild_ranks.get(guild_id)
+
+        if not ranks:
+            return LeaderboardPage([], 0)
+
+        # keys sort by descending score, so the cursor stays valid while scores around it move
+        key = (-cursor[0], cursor[1]) if cursor else None
+
+        if direction == 'next':
+            start = ranks.bisect(key, inclusive=True)
+        elif direction == 'back':
+            start = max(0, ranks.bisect(key) - size)
+        elif direction == 'last':
+            start = max(0, len(ranks) - size)
+        else:
+            start = 0
+
+        # paging past the end, e.g. after players left, shows the last page instead
+        if start >= len(ranks):
+            start = max(0, len(ranks) - size)
 
-        if not leaderboard:
+        entries = [
+            LeaderboardEntry(rank, user_id, -neg_score)
+            for rank, (neg_score, user_id) in enumerate(ranks.slice(start, size), start=start +1)
+        ]
+
+        return LeaderboardPage(entries, len(ranks))
+
+    def find(self, user_id: int, guild_id: int = None):
+        current = self.players.get(user_id)
+
+        if not current:
             return False
-                
-        return LeaderboardEntry(*leaderboard)
-
-    async def fetch_global_player(self, conn: asyncpg.Connection, user_id: int):
-        leaderboard = await conn.fetchrow(
-            """
-                WITH leaderboard AS (
-                SELECT
-                    user_id,
-                    GREATEST(highscore, score) AS best_score,
-                    ROW_NUMBER() OVER (ORDER BY GREATEST(highscore, score) DESC) AS rank
-                FROM player
-                )
-                SELECT rank, user_id, best_score
-                FROM leaderboard
-                WHERE user_id = $1;
-            """,
-            user_id
-        )
 
-        if not leaderboard:
+        player_guild_id, best_score = current
+
+        if guild_id is None:
+            ranks = self.global_ranks
+        elif guild_id == player_guild_id:
+            ranks = self.guild_ranks[guild_id]
+        else:
             return False
-                
-        return LeaderboardEntry(*leaderboard)
+
+        return LeaderboardEntry(ranks.rank((-best_score, user_id)), user_id, best_score)
+
+class Leaderboard:
+    def __init__(self, client: Client, db: PostgresDB, refresh_interval: float = None):
+        self.db = db
+        self.index = LeaderboardIndex()
+
+        self.refresh_interval = refresh_interval
+        self.refresh_task: asyncio.Task = None
+
+        # (guild_id, direction, cursor) -> (expires, page), oldest first since the ttl is fixed
+        self.pages: OrderedDict[tuple, tuple[float, LeaderboardPage]] = OrderedDict()
+
+        client.add_startup_hook(self.load_index)
+        client.add_shutdown_hook(self.stop_refresh)
+        Player.add_save_hook(self.track)
+
+    async def load_index(self):
+        async with self.db.connection(read_only=True) as conn:
+            await self.index.load(conn)
+
+        if self.refresh_interval and not self.refresh_task:
+            self.refresh_task = asyncio.create_task(self.refresh_loop())
+
+    async def refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+
+            try:
+                await self.load_index()
+            except Exception:
+                logger.exception("Leaderboard refresh failed")
+
+    async def stop_refresh(self):
+        if self.refresh_task:
+            self.refresh_task.cancel()
+
+    def track(self, p: Player):
+        self.index.update(p.user_id, p.guild_id, max(p.highscore, p.score))
+
+    def fetch(self, guild_id: int):
+        return self.index.top(guild_id, LB_SIZE)
+
+    def fetch_page(self, guild_id: int, direction: str = 'first', cursor: tuple[int, int] = None):
+        now = time.monotonic()
+
+        while self.pages and next(iter(self.pages.values()))[0] <= now:
+            self.pages.popitem(last=False)
+
+        key = (guild_id, direction, cursor)
+        cached = self.pages.get(key)
+
+        if cached:
+            return cached[1]
+
+        page = self.index.page(guild_id, direction, cursor, LB_SIZE)
+        self.pages[key] = (now + PAGE_TTL, page)
+
+        return page
+
+    def fetch_local_player(self, guild_id: int, user_id: int):
+        return self.index.find(user_id, guild_id)
+
+    def fetch_global_player(self, user_id: int):
+        return self.index.find(user_id)
+
+    def fetch_summary(self, guild_id: int, user_id: int, direction: str = 'first', cursor: tuple[int, int] = None):
+        page = self.fetch_page(guild_id, direction, cursor)
+
+        return LeaderboardSummary(
+            page.entries,
+            self.fetch_local_player(guild_id, user_id),
+            self.fetch_global_player(user_id),
+            page
+        )
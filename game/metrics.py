@@ -0,0 +1,214 @@
+import logging
+
+logger = logging.getLogger('scurrypy')
+
+from scurrypy import Client
+from scurrypy.core import HTTPClient
+
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable
+
+# upper bounds in seconds, the last bucket catches everything slower
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# name of the handler whose phases are being timed
+current_handler: ContextVar[str] = ContextVar('current_handler', default='background')
+
+class Histogram:
+    # the event loop is single threaded, so plain counters need no locking
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q: float):
+        if not self.count:
+            return 0.0
+
+        target = q * self.count
+        seen = 0
+
+        for i, n in enumerate(self.counts):
+            if seen + n >= target and n:
+                lower = BUCKETS[i -1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+
+                # interpolate linearly inside the bucket
+                return lower + (upper - lower) * (target - seen) / n
+
+            seen += n
+
+        return BUCKETS[-1]
+
+class Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+def _escape_label(value):
+    # the text format only allows these three escapes inside a quoted label value
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: tuple[tuple[str, str], ...], **extra):
+    pairs = list(labels) + list(extra.items())
+
+    return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + '}' if pairs else ''
+
+class Metrics:
+    def __init__(self):
+        self.histograms: dict[str, dict[tuple[tuple[str, str], ...], Histogram]] = {}
+        self.gauges: dict[str, Callable[[], float]] = {}
+
+        # (handler, phase) -> histogram, skips label handling on the hot path
+        self.phases: dict[tuple[str, str], Histogram] = {}
+
+    def histogram(self, name: str, **labels):
+        series = self.histograms.setdefault(name, {})
+        key = tuple(labels.items())
+
+        histogram = series.get(key)
+
+        if histogram is None:
+            histogram = series[key] = Histogram()
+
+        return histogram
+
+    def observe(self, name: str, seconds: float, **labels):
+        self.histogram(name, **labels).observe(seconds)
+
+    def add_gauge(self, name: str, read: Callable[[], float]):
+        self.gauges[name] = read
+
+    def timer(self, name: str, **labels):
+        return Timer(self.histogram(name, **labels))
+
+    def phase(self, phase: str):
+        key = (current_handler.get(), phase)
+        histogram = self.phases.get(key)
+
+        if histogram is None:
+            histogram = self.phases[key] = self.histogram('handler_phase_seconds', handler=key[0], phase=phase)
+
+        return Timer(histogram)
+
+    def render(self):
+        lines = []
+
+        for name, series in self.histograms.items():
+            lines.append(f"# TYPE {name} histogram")
+
+            for labels, h in series.items():
+                cumulative = 0
+
+                for bound, n in zip(BUCKETS + ('+Inf',), h.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+
+                lines.append(f"{name}_sum{_format_labels(labels)} {h.total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {h.count}")
+
+            lines.append(f"# TYPE {name}_quantile gauge")
+
+            for labels, h in series.items():
+                for q in QUANTILES:
+                    lines.append(f"{name}_quantile{_format_labels(labels, quantile=q)} {h.quantile(q)}")
+
+        for name, read in self.gauges.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {read()}")
+
+        return '\n'.join(lines) + '\n'
+
+METRICS = Metrics()
+
+def instrument(handler):
+    """Time a slash command or component handler as `phase="total"` and label its inner phases."""
+    @functools.wraps(handler)
+    async def wrapper(ctx, *args):
+        token = current_handler.set(handler.__name__)
+
+        try:
+            with METRICS.phase('total'):
+                await handler(ctx, *args)
+        finally:
+            current_handler.reset(token)
+
+    return wrapper
+
+def phase(name: str):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with METRICS.phase(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+class InstrumentedHTTPClient(HTTPClient):
+    async def request(self, method: str, endpoint: str, **kwargs):
+        with METRICS.phase('discord'):
+            return await super().request(method, endpoint, **kwargs)
+
+class MetricsServer:
+    def __init__(self, client: Client, host: str = '127.0.0.1', port: int = 9100):
+        self.host = host
+        self.port = port
+        self.server: asyncio.Server = None
+
+        client.add_startup_hook(self.start_server)
+        client.add_shutdown_hook(self.close_server)
+
+    async def start_server(self):
+        self.server = await asyncio.start_server(self.respond, self.host, self.port)
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def close_server(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def respond(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+
+            # drain headers, the request body is never needed
+            while (await reader.readline()).strip():
+                pass
+
+            if request_line.split()[1:2] == [b'/metrics']:
+                status, body = '200 OK', METRICS.render()
+            else:
+                status, body = '404 Not Found', 'not found\n'
+
+            payload = body.encode()
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode()
+                + payload
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,136 @@
+import asyncpg
+from typing import Awaitable, Callable
+
+from .card import HP_CODE, RANKS, FACES, SUITS
+
+# held while migrating so concurrently starting processes apply each step once
+MIGRATION_LOCK = 0x5175_1772
+
+CREATE_PLAYER = """
+    create table if not exists player(
+        user_id bigint primary key,
+        session_id text,
+        hp int,
+        score int,
+        highscore int,
+        guild_id bigint,
+        hand bytea,
+        options bytea
+    )
+"""
+
+def _sql_array(values: list[str]):
+    return "array[" + ", ".join(f"'{v}'" for v in values) + "]"
+
+# mirrors Card.pack for rows still stored as text[] like '{GL.10,HP.+1}'
+PACK_CARDS_FUNCTION = f"""
+    create or replace function pg_temp.pack_cards(cards text[]) returns bytea language sql immutable as $$
+        select coalesce(string_agg(
+            case
+                when split_part(c, '.', 1) = 'HP' then '\\x{HP_CODE:02x}'::bytea
+                else set_byte('\\x00'::bytea, 0,
+                    (array_position({_sql_array(SUITS)}, split_part(c, '.', 1)) - 1) * {len(RANKS + FACES)}
+                    + array_position({_sql_array(RANKS + FACES)}, split_part(c, '.', 2)) - 1)
+            end, ''::bytea order by i), ''::bytea)
+        from unnest(cards) with ordinality as t(c, i)
+    $$
+"""
+
+async def create_player(conn: asyncpg.Connection):
+    await conn.execute(CREATE_PLAYER)
+
+async def migrate_packed_cards(conn: asyncpg.Connection):
+    data_type = await conn.fetchval(
+        "select data_type from information_schema.columns where table_schema = current_schema() and table_name = 'player' and column_name = 'hand'")
+
+    if data_type != 'ARRAY':
+        return
+
+    async with conn.transaction():
+        await conn.execute(PACK_CARDS_FUNCTION)
+        await conn.execute(
+            """
+                alter table player
+                    alter column hand type bytea using pg_temp.pack_cards(hand),
+                    alter column options type bytea using pg_temp.pack_cards(options)
+            """)
+
+async def add_primary_key(conn: asyncpg.Connection):
+    has_key = await conn.fetchval(
+        "select exists(select 1 from pg_constraint where conrelid = 'player'::regclass and contype = 'p')")
+
+    if has_key:
+        return
+
+    # duplicates could be inserted by racing first fetches, keep the row with the best score
+    await conn.execute("delete from player where user_id is null")
+    await conn.execute(
+        """
+            delete from player where ctid in (
+                select ctid from (
+                    select ctid, row_number() over (
+                        partition by user_id order by GREATEST(highscore, score) desc nulls last, ctid
+                    ) as n
+                    from player
+                ) ranked
+                where n > 1
+            )
+        """)
+    await conn.execute("alter table player add primary key (user_id)")
+
+async def add_indexes(conn: asyncpg.Connection):
+    # guild leaderboards ordered by best score, user_id breaks ties
+    await conn.execute(
+        "create index if not exists player_guild_best_score on player (guild_id, GREATEST(highscore, score) desc, user_id)")
+
+    # players a Pirate can rob, matches TargetPool eligibility
+    await conn.execute(
+        "create index if not exists player_targets on player (guild_id, user_id) where length(hand) > 0 and hp > 0")
+
+async def add_move_log(conn: asyncpg.Connection):
+    # move_seq counts moves applied to the row, the log's tail for a player is everything after it
+    await conn.execute("alter table player add column if not exists move_seq bigint not null default 0")
+
+    await conn.execute(
+        """
+            create table if not exists move(
+                user_id bigint not null,
+                seq bigint not null,
+                session_id uuid,
+                kind smallint not null,
+                idx smallint not null,
+                points int not null,
+                cards bytea not null,
+                created_at timestamptz not null default now(),
+                primary key (user_id, seq)
+            )
+        """)
+
+# append only, a step's position is its schema version
+MIGRATIONS: list[Callable[[asyncpg.Connection], Awaitable[None]]] = [
+    create_player,
+    migrate_packed_cards,
+    add_primary_key,
+    add_indexes,
+    add_move_log
+]
+
+async def migrate(conn: asyncpg.Connection):
+    await conn.execute("select pg_advisory_lock($1)", MIGRATION_LOCK)
+
+    try:
+        await conn.execute(
+            "create table if not exists schema_version (version int primary key, applied_at timestamptz not null default now())")
+
+        applied = {r['version'] for r in await conn.fetch("select version from schema_version")}
+
+        for version, step in enumerate(MIGRATIONS, start=1):
+            if version in applied:
+                continue
+
+            # steps also check the schema themselves, so tables from before versioning upgrade cleanly
+            async with conn.transaction():
+                await step(conn)
+                await conn.execute("insert into schema_version (version) values ($1)", version)
+    finally:
+        await conn.execute("select pg_advisory_unlock($1)", MIGRATION_LOCK)
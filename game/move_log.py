@@ -0,0 +1,171 @@
+import logging
+
+logger = logging.getLogger('scurrypy')
+
+from scurrypy import Client
+
+import asyncio
+import asyncpg
+from contextlib import suppress
+
+from .card import Card
+from .db import GameConnection, PostgresDB
+from .engine import SelectResult, select, restart
+from .metrics import METRICS
+from .player import Player
+
+MOVE_FLUSH_INTERVAL = 1
+
+# how often the player cache writes snapshot rows while the log is on
+SNAPSHOT_INTERVAL = 60
+
+# records kept while the table is unreachable, new moves go unlogged past this
+MAX_PENDING = 100_000
+
+SELECT_MOVE = 0
+STOLEN_MOVE = 1
+RESTART_MOVE = 2
+
+MOVE_COLUMNS = ('user_id', 'seq', 'session_id', 'kind', 'idx', 'points', 'cards')
+
+# a retry after a lost commit acknowledgement must not trip over rows that did land
+RETRY_QUERY = f"insert into move ({', '.join(MOVE_COLUMNS)}) values ($1, $2, $3, $4, $5, $6, $7) on conflict do nothing"
+
+TAIL_QUERY = "select seq, session_id, kind, idx, cards from move where user_id = $1 and seq > $2 order by seq"
+
+COMPACT_QUERY = """
+    delete from move
+    using unnest($1::bigint[], $2::bigint[]) as snapshot(user_id, seq)
+    where move.user_id = snapshot.user_id and move.seq <= snapshot.seq
+"""
+
+class ReplayStream:
+    """Hands back the cards a logged move drew, in place of a RandomStream."""
+    __slots__ = ('drawn', 'dealt')
+
+    def __init__(self, drawn: list[Card], dealt: list[Card]):
+        self.drawn = drawn
+        self.dealt = dealt
+
+    def options(self, size: int, faces: bool):
+        return self.dealt
+
+    def bookie(self):
+        return self.drawn
+
+    def rank_card(self):
+        return self.drawn[0]
+
+# each move is one small insert-only row, the player row is only a snapshot of the moves up to its move_seq
+class MoveLog:
+    def __init__(self, client: Client, db: PostgresDB, flush_interval: float = MOVE_FLUSH_INTERVAL):
+        self.db = db
+        self.flush_interval = flush_interval
+
+        self.records: list[tuple] = []
+        self.flush_task: asyncio.Task = None
+
+        METRICS.add_gauge('move_log_pending', lambda: len(self.records))
+
+        client.add_startup_hook(self.start_flusher)
+        db.add_flush_hook(self.close)
+
+    async def start_flusher(self):
+        self.flush_task = asyncio.create_task(self.flush_loop())
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Move log flush failed")
+
+    async def close(self):
+        if self.flush_task:
+            self.flush_task.cancel()
+
+            # a COPY cut off mid-write has re-queued its records by the time the task ends
+            with suppress(asyncio.CancelledError):
+                await self.flush_task
+
+        await self.flush()
+
+    def append(self, p: Player, kind: int, idx: int = 0, points: int = 0, cards: list[Card] = ()):
+        # the player is saved with every move, so an unlogged move is still covered by its next snapshot
+        if len(self.records) >= MAX_PENDING:
+            logger.warning(f"Move log backlog full, move {p.move_seq} of {p.user_id} left to the snapshot")
+            return
+
+        # the move already advanced p.move_seq, so the record carries the seq it produced
+        self.records.append((p.user_id, p.move_seq, p.session_id, kind, idx, points, Card.pack(cards)))
+
+    def log_select(self, p: Player, idx: int, result: SelectResult):
+        # drawn cards then the new options are all a replay needs to redo the move
+        self.append(p, SELECT_MOVE, idx, result.points, result.drawn + p.options)
+
+    def log_stolen(self, p: Player, card: Card):
+        self.append(p, STOLEN_MOVE, cards=[card])
+
+    def log_restart(self, p: Player):
+        self.append(p, RESTART_MOVE, cards=p.options)
+
+    async def flush(self):
+        if not self.records:
+            return
+
+        records, self.records = self.records, []
+
+        try:
+            async with self.db.connection() as conn:
+                try:
+                    with METRICS.timer('db_query_seconds', query='move_copy'):
+                        await conn.copy_records_to_table('move', records=records, columns=MOVE_COLUMNS)
+                except asyncpg.UniqueViolationError:
+                    await conn.executemany(RETRY_QUERY, records)
+        except BaseException:
+            self.records[:0] = records
+            raise
+
+    @staticmethod
+    async def compact(conn: GameConnection, players: list[Player]):
+        # moves up to a written snapshot are never replayed again, and a record that landed late goes with the next one
+        snapshots = [(p.user_id, p.saved['move_seq']) for p in players if p.saved.get('move_seq') is not None]
+
+        if snapshots:
+            user_ids, seqs = zip(*snapshots)
+            await conn.execute(COMPACT_QUERY, user_ids, seqs)
+
+    @staticmethod
+    async def replay(conn: GameConnection, p: Player):
+        """Apply logged moves newer than `p`'s snapshot, returns how many were applied."""
+        records = await conn.fetch(TAIL_QUERY, p.user_id, p.move_seq)
+        applied = 0
+
+        for record in records:
+            # a dropped record leaves a gap, the snapshot is the best state past it
+            if record['seq'] != p.move_seq + 1:
+                logger.warning(f"Move log gap for {p.user_id} after move {p.move_seq}, replay stopped")
+                return applied
+
+            cards = Card.unpack(record['cards'])
+            p.session_id = str(record['session_id'])
+
+            if record['kind'] == SELECT_MOVE:
+                card = p.options[record['idx']]
+                drawn = 2 if card.rank == 'B' else 1 if card.rank == 'P' else 0
+
+                select(p, record['idx'], rng=ReplayStream(cards[:drawn], cards[drawn:]))
+
+            elif record['kind'] == STOLEN_MOVE:
+                p.hand.remove(cards[0])
+                p.move_seq += 1
+
+            elif record['kind'] == RESTART_MOVE:
+                restart(p, ReplayStream([], cards))
+
+            p.move_seq = record['seq']
+            applied += 1
+
+        return applied
@@ -1,25 +1,48 @@
-import asyncpg
-import random
 from dataclasses import dataclass, field
+from functools import cache
+from typing import Callable, ClassVar
 
-from .card import Card, RANKS, SUITS, FACES
+from .card import Card
 from .card_event import CardEvent
+from .db import GameConnection, hot_statement
+from .hand import Hand
+from .rng import RandomStream, SHARED_STREAM
 
 MAX_HEALTH = 3
 OPTIONS_SIZE = 3
 
-"""
-create table player(
-    user_id bigint,
-    session_id text,
-    hp int,
-    score int,
-    highscore int,
-    guild_id bigint,
-    hand text[],
-    options text[]
-);
-"""
+FETCH_QUERY = hot_statement('player_fetch', "select * from player where user_id = $1")
+INSERT_QUERY = hot_statement('player_insert', "insert into player values ($1, 0, $2, 0, 0, 0, ''::bytea, $3) on conflict (user_id) do nothing")
+# columns written by save, in statement order
+SAVE_COLUMNS = ('session_id', 'hp', 'score', 'highscore', 'hand', 'options', 'guild_id', 'move_seq')
+
+@cache
+def save_query(columns: tuple[str, ...]):
+    assignments = ', '.join(f"{column} = ${i}" for i, column in enumerate(columns, start=1))
+
+    return f"update player set {assignments} where user_id = ${len(columns) + 1}"
+
+SAVE_QUERY = hot_statement('player_save', save_query(SAVE_COLUMNS))
+
+# removes a random card from a robbable player in one statement, the row lock serializes concurrent thieves
+STEAL_QUERY = hot_statement('player_steal', """
+    with victim as (
+        select user_id, hand, floor(random() * length(hand))::int as idx
+        from player
+        where user_id = $1 and length(hand) > 0 and hp > 0
+        for update
+    )
+    update player p
+    set hand = substring(victim.hand from 1 for victim.idx) || substring(victim.hand from victim.idx + 2), move_seq = p.move_seq + 1
+    from victim
+    where p.user_id = victim.user_id
+    returning p.*, get_byte(victim.hand, victim.idx) as stolen
+""")
+
+# puts a stolen card back when the thief's move fails, see PlayerCache.give_back
+GIVE_BACK_QUERY = "update player set hand = hand || $2 where user_id = $1"
+
+# the player table is created and versioned by migrations.py, hand and options hold one byte per card, see Card.pack
 
 @dataclass
 class Player:
@@ -31,24 +54,56 @@ class Player:
     highscore: int = 0
     guild_id: int = 0
 
-    hand: list[str | Card] = field(default_factory=list)
-    options: list[str | Card] = field(default_factory=list)
+    # moves applied so far, a move log tail starts after it
+    move_seq: int = 0
+
+    hand: Hand = field(default_factory=Hand)
+    options: list[Card] = field(default_factory=list)
+
+    # column -> value as last read from or written to the table
+    saved: dict[str, object] = field(default_factory=dict, repr=False, compare=False)
+
+    save_hooks: ClassVar[list[Callable[['Player'], None]]] = []
 
-    async def fetch(self, conn: asyncpg.Connection, auto_insert: bool = True):
-        record = await conn.fetchrow(f"select * from player where user_id = {self.user_id}")
+    def __post_init__(self):
+        if not isinstance(self.hand, Hand):
+            self.hand = Hand(self.hand)
+
+    @classmethod
+    def add_save_hook(cls, hook: Callable[['Player'], None]):
+        cls.save_hooks.append(hook)
+
+    async def fetch(self, conn: GameConnection, auto_insert: bool = True):
+        record = await conn.prepared(FETCH_QUERY).fetchrow(self.user_id)
 
         if not record:
             if not auto_insert:
                 return False
             
-            options = [
-                Card.random_rank().to_str() 
+            options = Card.pack([
+                Card.random_rank()
                 for _ in range(OPTIONS_SIZE)
-            ]
+            ])
 
-            await conn.execute("insert into player values ($1, 0, $2, 0, 0, 0, '{}', $3::text[])", self.user_id, MAX_HEALTH, options)
-            record = await conn.fetchrow("select * from player where user_id = $1", self.user_id)
+            await conn.prepared(INSERT_QUERY).fetch(self.user_id, MAX_HEALTH, options)
+            record = await conn.prepared(FETCH_QUERY).fetchrow(self.user_id)
         
+        return self.load_record(record)
+
+    async def steal(self, conn: GameConnection):
+        record = await conn.prepared(STEAL_QUERY).fetchrow(self.user_id)
+
+        if not record:
+            return None
+
+        self.load_record(record)
+
+        return Card.from_code(record.get('stolen'))
+
+    async def give_back(self, conn: GameConnection, card: Card):
+        await conn.execute(GIVE_BACK_QUERY, self.user_id, Card.pack([card]))
+
+    def load_record(self, record):
         record = dict(record)
 
         self.session_id = record.get('session_id')
@@ -56,18 +111,77 @@ class Player:
         self.score = record.get('score')
         self.highscore = record.get('highscore')
         self.guild_id = record.get('guild_id')
+        self.move_seq = record.get('move_seq')
 
-        self.hand = [Card.to_card(c) for c in record.get('hand', [])]
-        self.options = [Card.to_card(c) for c in record.get('options')]
+        self.hand = Hand(Card.unpack(record.get('hand') or b''))
+        self.options = Card.unpack(record.get('options'))
+
+        self.saved = self.column_values()
 
         return self
 
-    async def save(self, conn: asyncpg.Connection):
-        new_hand = [c.to_str() for c in self.hand]
-        new_options = [c.to_str() for c in self.options]
+    def restore(self, values: dict[str, object]):
+        # rolls back to a column_values() snapshot, what the table holds is unchanged
+        saved = self.saved
+        self.load_record(values)
+        self.saved = saved
+
+        return self
+
+    def column_values(self):
+        return {
+            'session_id': self.session_id,
+            'hp': self.hp,
+            'score': self.score,
+            'highscore': self.highscore,
+            'hand': Card.pack(self.hand),
+            'options': Card.pack(self.options),
+            'guild_id': self.guild_id,
+            'move_seq': self.move_seq
+        }
+
+    def changes(self):
+        return {column: value for column, value in self.column_values().items() if column not in self.saved or self.saved[column] != value}
+
+    def run_save_hooks(self):
+        for hook in self.save_hooks:
+            hook(self)
+
+    async def save(self, conn: GameConnection):
+        changes = self.changes()
+
+        if changes:
+            statement = await conn.prepare_cached(save_query(tuple(changes)), 'player_save')
+            await statement.fetch(*changes.values(), self.user_id)
+
+            self.saved.update(changes)
 
-        await conn.execute("update player set session_id = $1, hp = $2, score = $3, highscore = $4, hand = $5::text[], options = $6::text[], guild_id = $7 where user_id = $8",
-            self.session_id, self.hp, self.score, self.highscore, new_hand, new_options, self.guild_id, self.user_id)
+        self.run_save_hooks()
+
+    @staticmethod
+    async def save_many(conn: GameConnection, players: list['Player']):
+        # one executemany per distinct set of changed columns
+        batches: dict[tuple[str, ...], list[tuple]] = {}
+        written: list[tuple[Player, dict]] = []
+
+        for p in players:
+            changes = p.changes()
+
+            if changes:
+                batches.setdefault(tuple(changes), []).append((*changes.values(), p.user_id))
+                written.append((p, changes))
+
+        if not batches:
+            return
+
+        async with conn.transaction():
+            for columns, rows in batches.items():
+                statement = await conn.prepare_cached(save_query(columns), 'player_save')
+                await statement.executemany(rows)
+
+        # only what was written counts as saved, later edits stay pending
+        for p, changes in written:
+            p.saved.update(changes)
 
     def add_card(self, card: Card):
         e = CardEvent()
@@ -87,13 +201,5 @@ class Player:
         
         return e
 
-    def new_options(self):
-        ranks = random.sample(population=RANKS if len(self.hand) == 0 else RANKS + FACES, k=OPTIONS_SIZE)
-        suits = random.choices(population=SUITS, k=OPTIONS_SIZE)
-
-        new_options = [Card(s, r) for s, r in zip(suits, ranks)]
-
-        if random.randint(0, 100) > 80:
-            new_options[random.randint(0, OPTIONS_SIZE -1)] = Card('HP', '+1')
-
-        self.options = new_options
+    def new_options(self, rng: RandomStream = SHARED_STREAM):
+        self.options = rng.options(OPTIONS_SIZE, len(self.hand) > 0)
@@ -0,0 +1,235 @@
+import logging
+
+logger = logging.getLogger('scurrypy')
+
+from scurrypy import Client
+
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from typing import Callable
+from contextlib import asynccontextmanager, suppress
+
+from .card import Card
+from .db import PostgresDB
+from .player import Player
+from .move_log import MoveLog
+
+CACHE_SIZE = 10_000
+CACHE_TTL = 15 * 60
+FLUSH_INTERVAL = 2
+
+# reads are served from memory, saves are coalesced into batched updates per flush
+class PlayerCache:
+    def __init__(self, client: Client, db: PostgresDB, max_size: int = CACHE_SIZE, ttl: float = CACHE_TTL, flush_interval: float = FLUSH_INTERVAL, move_log: MoveLog = None, is_local: Callable[[int], bool] = None):
+        self.db = db
+        self.move_log = move_log
+        self.max_size = max_size
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+
+        # set when other processes serve some guilds, tells whether this one serves a guild_id
+        self.is_local = is_local
+
+        # user_id -> (player, last used), least recently used first
+        self.players: OrderedDict[int, tuple[Player, float]] = OrderedDict()
+        self.dirty: set[int] = set()
+
+        # dirty ids taken by a flush that hasn't finished, their copies are still the newest
+        self.flushing: set[int] = set()
+
+        # user_id -> future resolved once a load or steal against the table finishes
+        self.pending: dict[int, asyncio.Future] = {}
+
+        self.flush_task: asyncio.Task = None
+
+        client.add_startup_hook(self.start_flusher)
+        db.add_flush_hook(self.close)
+
+    async def start_flusher(self):
+        self.flush_task = asyncio.create_task(self.flush_loop())
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Player cache flush failed")
+
+            self.evict()
+
+    async def close(self):
+        if self.flush_task:
+            self.flush_task.cancel()
+
+            # a flush cut off mid-write has put its players back by the time the task ends
+            with suppress(asyncio.CancelledError):
+                await self.flush_task
+
+        await self.flush()
+
+    def get(self, user_id: int):
+        cached = self.players.get(user_id)
+
+        if not cached:
+            return None
+
+        self.players[user_id] = (cached[0], time.monotonic())
+        self.players.move_to_end(user_id)
+
+        return cached[0]
+
+    def put(self, p: Player):
+        self.players[p.user_id] = (p, time.monotonic())
+        self.players.move_to_end(p.user_id)
+
+    async def wait_pending(self, user_id: int):
+        while user_id in self.pending:
+            await self.pending[user_id]
+
+    @asynccontextmanager
+    async def hold(self, user_id: int):
+        # nothing else reads this player from the table until the block exits
+        future = self.pending[user_id] = asyncio.get_running_loop().create_future()
+
+        try:
+            yield
+        finally:
+            del self.pending[user_id]
+            future.set_result(None)
+
+    async def fetch(self, user_id: int):
+        await self.wait_pending(user_id)
+
+        p = self.get(user_id)
+
+        if p:
+            return p
+
+        async with self.hold(user_id), self.db.connection() as conn:
+            p = await Player(user_id).fetch(conn)
+
+            # moves logged after the last snapshot are redone, then snapshotted on the next flush
+            replayed = p and self.move_log and await self.move_log.replay(conn, p)
+
+        if not p:
+            return False
+
+        self.put(p)
+
+        if replayed:
+            self.dirty.add(user_id)
+
+        return p
+
+    async def refresh(self, user_id: int):
+        # another process may have written the row since it was cached, a dirty copy is already the newest
+        await self.wait_pending(user_id)
+
+        if not self.unsaved(user_id):
+            self.players.pop(user_id, None)
+
+        return await self.fetch(user_id)
+
+    async def steal(self, user_id: int):
+        await self.wait_pending(user_id)
+
+        victim = self.get(user_id)
+
+        # with a move log the row can trail the log, and with several workers only a copy in memory is coherent,
+        # so the victim is loaded and replayed to rob it in memory
+        if not victim and (self.move_log or self.is_local):
+            victim = await self.fetch(user_id)
+
+        # another worker serves this victim and may hold a newer copy, so cross-worker steals are refused
+        if victim and self.is_local and not self.is_local(victim.guild_id):
+            if not self.unsaved(user_id):
+                self.players.pop(user_id, None)
+
+            return None
+
+        # a victim cached here is the newest copy, and popping it is atomic within the event loop
+        if victim:
+            if not victim.hand or victim.hp <= 0:
+                return None
+
+            card = victim.hand.pop(random.randrange(len(victim.hand)))
+            victim.move_seq += 1
+
+            self.save(victim)
+
+            if self.move_log:
+                self.move_log.log_stolen(victim, card)
+
+            return card
+
+        victim = Player(user_id)
+
+        async with self.hold(user_id), self.db.connection() as conn:
+            card = await victim.steal(conn)
+
+        if card:
+            # the row was already written by the steal, only the indexes need to see it
+            self.put(victim)
+            victim.run_save_hooks()
+
+        return card
+
+    def unsaved(self, user_id: int):
+        return user_id in self.dirty or user_id in self.flushing
+
+    def save(self, p: Player):
+        self.put(p)
+        self.dirty.add(p.user_id)
+
+        p.run_save_hooks()
+
+    async def give_back(self, user_id: int, card: Card):
+        # undoes a steal for a thief whose move failed, the move_seq the steal used is not reused
+        await self.wait_pending(user_id)
+
+        victim = self.get(user_id)
+
+        if victim:
+            victim.hand.append(card)
+            self.save(victim)
+            return
+
+        async with self.hold(user_id), self.db.connection() as conn:
+            await Player(user_id).give_back(conn, card)
+
+    async def flush(self):
+        if not self.dirty:
+            return
+
+        user_ids, self.dirty = self.dirty, set()
+        self.flushing |= user_ids
+
+        players = [self.players[user_id][0] for user_id in user_ids]
+
+        try:
+            async with self.db.connection() as conn:
+                await Player.save_many(conn, players)
+
+                if self.move_log:
+                    await self.move_log.compact(conn, players)
+        except BaseException:
+            # an id dropped from the cache meanwhile has no copy left to write
+            self.dirty |= {user_id for user_id in user_ids if user_id in self.players}
+            raise
+        finally:
+            self.flushing -= user_ids
+
+    def evict(self):
+        expires = time.monotonic() - self.ttl
+
+        for user_id, (_, last_used) in list(self.players.items()):
+            if len(self.players) <= self.max_size and last_used > expires:
+                break
+
+            # dirty players stay until a flush has written them
+            if not self.unsaved(user_id):
+                del self.players[user_id]
@@ -0,0 +1,121 @@
+import random
+from math import log
+
+MAX_LEVELS = 32
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next: list[_Node] = [None] * levels
+        self.width: list[int] = [1] * levels
+
+class RankIndex:
+    """Indexable skip list: insert, remove, rank and positional lookup in O(log n)."""
+
+    def __init__(self):
+        self.size = 0
+        self.tail = _Node(None, 0)
+        self.head = _Node(None, MAX_LEVELS)
+        self.head.next = [self.tail] * MAX_LEVELS
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return self.slice(0, self.size)
+
+    def insert(self, key):
+        chain = [None] * MAX_LEVELS
+        steps_at_level = [0] * MAX_LEVELS
+        node = self.head
+
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not self.tail and node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = min(MAX_LEVELS, 1 - int(log(1.0 - random.random(), 2.0)))
+        new_node = _Node(key, levels)
+
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+
+        for level in range(levels, MAX_LEVELS):
+            chain[level].width[level] += 1
+
+        self.size += 1
+
+    def remove(self, key):
+        chain = [None] * MAX_LEVELS
+        node = self.head
+
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not self.tail and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        found = chain[0].next[0]
+
+        if found is self.tail or found.key != key:
+            raise KeyError(key)
+
+        for level in range(len(found.next)):
+            prev = chain[level]
+            prev.width[level] += found.width[level] - 1
+            prev.next[level] = found.next[level]
+
+        for level in range(len(found.next), MAX_LEVELS):
+            chain[level].width[level] -= 1
+
+        self.size -= 1
+
+    def rank(self, key):
+        """1-based position of `key`, or `None` if it is not indexed."""
+        node = self.head
+        position = 0
+
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not self.tail and node.next[level].key <= key:
+                position += node.width[level]
+                node = node.next[level]
+
+        return position if node is not self.head and node.key == key else None
+
+    def bisect(self, key, inclusive: bool = False):
+        """Number of keys below `key`, or at most `key` when `inclusive`."""
+        node = self.head
+        position = 0
+
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not self.tail and (node.next[level].key <= key if inclusive else node.next[level].key < key):
+                position += node.width[level]
+                node = node.next[level]
+
+        return position
+
+    def slice(self, start: int, count: int):
+        """Yield up to `count` keys beginning at 0-based position `start`."""
+        node = self.head
+        remaining = start + 1
+
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not self.tail and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+
+        if remaining:
+            return
+
+        while count > 0 and node is not self.tail:
+            yield node.key
+            node = node.next[0]
+            count -= 1
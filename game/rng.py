@@ -0,0 +1,117 @@
+import random
+from array import array
+from collections import OrderedDict
+from functools import cache
+from itertools import permutations, product
+
+from .card import Card, CARDS, RANKS, FACES, SUITS, RANK_CARDS
+
+BLOCK_SIZE = 256
+
+# a move uses at most 5 uniforms (bookie then new options) and gets a fixed slot of 8, one seeding covers 16 moves
+MOVE_UNIFORMS = 8
+BLOCK_MOVES = 16
+STREAMS_SIZE = 10_000
+
+# same odds as the old randint(0, 100) > 80 roll
+HP_CHANCE = 20 / 101
+
+@cache
+def rank_orders(faces: bool, k: int):
+    return list(permutations(RANKS + FACES if faces else RANKS, k))
+
+@cache
+def suit_orders(k: int):
+    return list(product(SUITS, repeat=k))
+
+class RandomStream:
+    """Deterministic draws for one game, served from pre-generated blocks of uniforms."""
+    __slots__ = ('rng', 'block', 'pos')
+
+    def __init__(self, seed = None, rng: random.Random = None):
+        self.rng = rng or random.Random(seed)
+        self.block: list[float] = []
+        self.pos = 0
+
+    def refill(self):
+        draw = self.rng.random
+
+        return [draw() for _ in range(BLOCK_SIZE)]
+
+    def uniform(self):
+        if self.pos == len(self.block):
+            self.block = self.refill()
+            self.pos = 0
+
+        u = self.block[self.pos]
+        self.pos += 1
+
+        return u
+
+    def choice(self, seq):
+        return seq[int(self.uniform() * len(seq))]
+
+    def options(self, size: int, faces: bool):
+        # one draw each picks distinct ranks and the suits, instead of a sample and a choices call
+        ranks = self.choice(rank_orders(faces, size))
+        suits = self.choice(suit_orders(size))
+
+        options = [CARDS[s, r] for s, r in zip(suits, ranks)]
+
+        roll = self.uniform()
+
+        if roll < HP_CHANCE:
+            # a roll under the chance is uniform over it, so it also picks the slot
+            options[min(size -1, int(roll / HP_CHANCE * size))] = CARDS['HP', '+1']
+
+        return options
+
+    def bookie(self):
+        ranks = self.choice(rank_orders(False, 2))
+        suits = self.choice(suit_orders(2))
+
+        return [CARDS[s, r] for s, r in zip(suits, ranks)]
+
+    def rank_card(self) -> Card:
+        return self.choice(RANK_CARDS)
+
+# draws for callers without a game stream, follows random.seed
+SHARED_STREAM = RandomStream(rng=random)
+
+class MoveStream(RandomStream):
+    """Draws for one move, a fixed slice of its session's block so they only depend on the session and move_seq."""
+    __slots__ = ()
+
+    def __init__(self, block: array):
+        self.block = block
+        self.pos = 0
+
+    def refill(self):
+        raise IndexError(f"a move draws at most {MOVE_UNIFORMS} uniforms")
+
+class RandomStreams:
+    def __init__(self, secret: str, max_size: int = STREAMS_SIZE):
+        self.secret = secret
+        self.max_size = max_size
+
+        # session_id -> (block index, uniforms for its moves), least recently used first
+        self.blocks: OrderedDict[str, tuple[int, array]] = OrderedDict()
+
+    def get(self, session_id: str, move_seq: int):
+        # move_seq is saved with the player, so a reload, eviction or other worker draws the same cards for a move
+        index, move = divmod(move_seq, BLOCK_MOVES)
+        cached = self.blocks.get(session_id)
+
+        if cached is None or cached[0] != index:
+            # session ids are visible in custom ids, the secret keeps draws unpredictable to players
+            rng = random.Random(f"{self.secret}:{session_id}:{index}")
+            cached = self.blocks[session_id] = (index, array('d', [rng.random() for _ in range(BLOCK_MOVES * MOVE_UNIFORMS)]))
+
+            if len(self.blocks) > self.max_size:
+                self.blocks.popitem(last=False)
+
+        self.blocks.move_to_end(session_id)
+
+        start = move * MOVE_UNIFORMS
+
+        return MoveStream(cached[1][start:start + MOVE_UNIFORMS])
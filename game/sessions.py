@@ -0,0 +1,30 @@
+from collections import OrderedDict
+
+from .card import Card
+from .custom_ids import session_token
+from .player import Player
+
+SESSIONS_SIZE = 100_000
+
+# current session and dealt options per user, so clicks on old messages are turned away without a connection
+class SessionMap:
+    def __init__(self, max_size: int = SESSIONS_SIZE):
+        self.max_size = max_size
+
+        # user_id -> (session token, packed options), least recently used first
+        self.sessions: OrderedDict[int, tuple[bytes, bytes]] = OrderedDict()
+
+        Player.add_save_hook(self.track)
+
+    def track(self, p: Player):
+        self.sessions[p.user_id] = (session_token(p.session_id), Card.pack(p.options))
+        self.sessions.move_to_end(p.user_id)
+
+        if len(self.sessions) > self.max_size:
+            self.sessions.popitem(last=False)
+
+    def is_stale(self, user_id: int, token: bytes, options: bytes):
+        # unknown users are not stale, the caller checks them against the table
+        current = self.sessions.get(user_id)
+
+        return current is not None and current != (token, options)
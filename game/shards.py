@@ -0,0 +1,71 @@
+from scurrypy import Client
+from scurrypy.events.gateway_events import GatewayEvent
+
+import asyncio
+import multiprocessing
+import time
+
+# scurrypy waits this long between identify batches, see Client.start_shards
+IDENTIFY_INTERVAL = 5
+
+class ShardCoordinator:
+    """Lets every worker finish its startup hooks before any of them identifies."""
+
+    def __init__(self, ctx = multiprocessing):
+        self.ready = ctx.Semaphore(0)
+        self.go = ctx.Event()
+        self.epoch = ctx.Value('d', 0.0)
+
+    async def wait_for_turn(self):
+        self.ready.release()
+
+        await asyncio.to_thread(self.go.wait)
+
+        return self.epoch.value
+
+    def wait_ready(self, workers: int, timeout: float):
+        deadline = time.monotonic() + timeout
+
+        return all(self.ready.acquire(timeout=max(0, deadline - time.monotonic())) for _ in range(workers))
+
+    def release(self):
+        self.epoch.value = time.time() + 1
+        self.go.set()
+
+# runs only some of the bot's shards, so several processes can share one bot
+class ShardedClient(Client):
+    def __init__(self, *, shard_ids: list[int] = None, coordinator: ShardCoordinator = None, **kwargs):
+        super().__init__(**kwargs)
+
+        self.shard_ids = shard_ids
+        self.coordinator = coordinator
+
+    def serves_guild(self, guild_id: int):
+        # Discord routes a guild to shard (guild_id >> 22) % shard_count
+        return self.shard_ids is None or not self.shard_count or ((guild_id or 0) >> 22) % self.shard_count in self.shard_ids
+
+    async def start_shards(self, gateway: GatewayEvent):
+        if self.shard_ids is None:
+            return await super().start_shards(gateway)
+
+        total_shards = self.shard_count or gateway.shards
+        batch_size = gateway.session_start_limit.max_concurrency
+
+        epoch = await self.coordinator.wait_for_turn() if self.coordinator else time.time()
+
+        tasks = []
+
+        for shard_id in sorted(self.shard_ids):
+            # identify batches are global, so a shard waits for its batch's slot whichever process runs it
+            delay = epoch + IDENTIFY_INTERVAL * (shard_id // batch_size) - time.time()
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            shard = self.shard_type()
+            self.shards.append(shard)
+
+            tasks.append(asyncio.create_task(shard.start(self.token, self.intents, shard_id, total_shards)))
+            tasks.append(asyncio.create_task(self.listen_shard(shard)))
+
+        return tasks
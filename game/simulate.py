@@ -0,0 +1,168 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from .card import FACES
+from .engine import select
+from .player import Player, MAX_HEALTH
+from .rng import RandomStream
+
+MAX_TURNS = 5_000
+BATCH_SIZE = 5_000
+
+# policies draw from the game's stream too, so a game number and seed pin down every turn
+def pick_random(p: Player, rng: RandomStream):
+    return int(rng.uniform() * len(p.options))
+
+def rate_option(p: Player, card):
+    if card.suit == 'HP':
+        return 3 if p.hp < MAX_HEALTH else -1
+
+    if card.rank in FACES:
+        return 2 if card.rank == 'W' and p.hand.total > 21 else 0
+
+    total = p.hand.total + card.value
+
+    if total == 21:
+        return 5
+
+    if p.hand.has_rank(card.rank):
+        return 4
+
+    return 1 if total <= 21 else -2
+
+def pick_greedy(p: Player, rng: RandomStream):
+    return max(range(len(p.options)), key=lambda i: rate_option(p, p.options[i]))
+
+POLICIES = {
+    'random': pick_random,
+    'greedy': pick_greedy
+}
+
+@dataclass
+class SimulationReport:
+    games: int = 0
+    turns: int = 0
+    stashes: int = 0
+    matches: int = 0
+    busts: int = 0
+    truncated: int = 0
+    scores: Counter = field(default_factory=Counter)
+
+    def merge(self, other: 'SimulationReport'):
+        self.games += other.games
+        self.turns += other.turns
+        self.stashes += other.stashes
+        self.matches += other.matches
+        self.busts += other.busts
+        self.truncated += other.truncated
+        self.scores.update(other.scores)
+
+    def percentile(self, pct: float):
+        target = pct / 100 * self.games
+        seen = 0
+
+        for score in sorted(self.scores):
+            seen += self.scores[score]
+
+            if seen >= target:
+                return score
+
+        return 0
+
+    def summary(self):
+        mean = sum(score * n for score, n in self.scores.items()) / max(self.games, 1)
+        per_game = lambda n: n / max(self.games, 1)
+        per_turn = lambda n: n / max(self.turns, 1)
+
+        return '\n'.join([
+            f"games: {self.games} ({self.truncated} hit the {MAX_TURNS} turn cap)",
+            f"turns/game: {per_game(self.turns):.2f}",
+            f"score: mean {mean:.1f}, " + ', '.join(f"p{pct} {self.percentile(pct)}" for pct in (10, 25, 50, 75, 90, 99)) + f", max {max(self.scores, default=0)}",
+            f"stashes: {per_game(self.stashes):.3f}/game, {per_turn(self.stashes):.4f}/turn",
+            f"matches: {per_game(self.matches):.3f}/game, {per_turn(self.matches):.4f}/turn",
+            f"busts: {per_game(self.busts):.3f}/game, {per_turn(self.busts):.4f}/turn"
+        ])
+
+def play(policy, rng: RandomStream):
+    p = Player(0)
+    p.new_options(rng)
+
+    for _ in range(MAX_TURNS):
+        if p.hp <= 0:
+            return
+
+        options = p.options
+        idx = policy(p, rng)
+
+        yield p, options, idx, select(p, idx, rng=rng)
+
+def game_stream(seed: int, game: int):
+    return RandomStream(f"{seed}:{game}")
+
+def play_game(policy, rng: RandomStream, report: SimulationReport):
+    turns = 0
+
+    for p, _, _, result in play(policy, rng):
+        turns += 1
+
+        for e in result.events:
+            report.stashes += e.is_stash
+            report.matches += bool(e.is_match)
+
+        report.busts += result.busted
+
+    report.games += 1
+    report.turns += turns
+    report.truncated += turns == MAX_TURNS
+    report.scores[p.score] += 1
+
+def play_batch(policy_name: str, start: int, games: int, seed: int):
+    policy = POLICIES[policy_name]
+    report = SimulationReport()
+
+    for game in range(start, start + games):
+        play_game(policy, game_stream(seed, game), report)
+
+    return report
+
+def simulate(games: int, policy_name: str = 'random', workers: int = None, seed: int = 0):
+    starts = list(range(0, games, BATCH_SIZE))
+    report = SimulationReport()
+
+    # the Pirate never finds a target here, so it always draws
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch in pool.map(play_batch, [policy_name] * len(starts), starts, [min(BATCH_SIZE, games - start) for start in starts], [seed] * len(starts)):
+            report.merge(batch)
+
+    return report
+
+def replay(game: int, policy_name: str = 'random', seed: int = 0):
+    lines = []
+
+    for turn, (p, options, idx, result) in enumerate(play(POLICIES[policy_name], game_stream(seed, game)), start=1):
+        drawn = f" drew {' '.join(c.text for c in result.drawn)}" if result.drawn else ''
+
+        lines.append(
+            f"{turn:>4}. {' '.join(c.text for c in options)} -> {options[idx].text}{drawn}"
+            + f" | +{result.points} score {p.score} hp {p.hp} hand {' '.join(c.text for c in p.hand) or '-'}"
+        )
+
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Play many headless games to inspect score and event rates.")
+    parser.add_argument('--games', type=int, default=100_000)
+    parser.add_argument('--policy', choices=POLICIES, default='random')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--replay', type=int, default=None, metavar='GAME', help="print every turn of one game from this seed instead")
+
+    args = parser.parse_args()
+
+    if args.replay is not None:
+        print(replay(args.replay, args.policy, args.seed))
+    else:
+        print(simulate(args.games, args.policy, args.workers, args.seed).summary())
@@ -0,0 +1,129 @@
+import logging
+
+logger = logging.getLogger('scurrypy')
+
+from scurrypy import Client
+
+import asyncio
+import asyncpg
+import random
+from typing import Callable
+
+from .db import PostgresDB
+from .player import Player
+
+class TargetBucket:
+    def __init__(self):
+        self.user_ids: list[int] = []
+        self.positions: dict[int, int] = {}
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def add(self, user_id: int):
+        if user_id in self.positions:
+            return
+
+        self.positions[user_id] = len(self.user_ids)
+        self.user_ids.append(user_id)
+
+    def discard(self, user_id: int):
+        idx = self.positions.pop(user_id, None)
+
+        if idx is None:
+            return
+
+        # swap the last id into the hole so removal stays O(1)
+        last = self.user_ids.pop()
+
+        if last != user_id:
+            self.user_ids[idx] = last
+            self.positions[last] = idx
+
+    def sample(self, exclude: int):
+        size = len(self.user_ids)
+
+        if exclude not in self.positions:
+            return random.choice(self.user_ids) if size else None
+
+        if size < 2:
+            return None
+
+        # draw from every slot but one, remapping the excluded id onto the last slot
+        user_id = self.user_ids[random.randrange(size -1)]
+
+        return self.user_ids[size -1] if user_id == exclude else user_id
+
+class TargetPool:
+    def __init__(self, client: Client, db: PostgresDB, refresh_interval: float = None, is_local: Callable[[int], bool] = None):
+        self.db = db
+
+        # with several workers only players in guilds this worker serves can be robbed, see PlayerCache.steal
+        self.is_local = is_local
+
+        self.refresh_interval = refresh_interval
+        self.refresh_task: asyncio.Task = None
+
+        self.everyone = TargetBucket()
+        self.guilds: dict[int, TargetBucket] = {}
+
+        # user_id -> guild_id for every eligible target
+        self.members: dict[int, int] = {}
+
+        client.add_startup_hook(self.load_targets)
+        client.add_shutdown_hook(self.stop_refresh)
+        Player.add_save_hook(self.track)
+
+    async def load_targets(self):
+        async with self.db.connection(read_only=True) as conn:
+            await self.load(conn)
+
+        if self.refresh_interval and not self.refresh_task:
+            self.refresh_task = asyncio.create_task(self.refresh_loop())
+
+    async def refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+
+            try:
+                await self.load_targets()
+            except Exception:
+                logger.exception("Target pool refresh failed")
+
+    async def stop_refresh(self):
+        if self.refresh_task:
+            self.refresh_task.cancel()
+
+    async def load(self, conn: asyncpg.Connection):
+        records = await conn.fetch("select user_id, guild_id from player where length(hand) > 0 and hp > 0")
+
+        # a reload starts over, players other processes emptied since the last load must drop out
+        self.everyone = TargetBucket()
+        self.guilds = {}
+        self.members = {}
+
+        for user_id, guild_id in records:
+            self.update(user_id, guild_id, True)
+
+    def track(self, p: Player):
+        self.update(p.user_id, p.guild_id, len(p.hand) > 0 and p.hp > 0)
+
+    def update(self, user_id: int, guild_id: int, eligible: bool):
+        eligible = eligible and (self.is_local is None or self.is_local(guild_id))
+
+        current = self.members.get(user_id)
+
+        if current is not None and (not eligible or current != guild_id):
+            del self.members[user_id]
+            self.everyone.discard(user_id)
+            self.guilds[current].discard(user_id)
+
+        if eligible and user_id not in self.members:
+            self.members[user_id] = guild_id
+            self.everyone.add(user_id)
+            self.guilds.setdefault(guild_id, TargetBucket()).add(user_id)
+
+    def sample(self, exclude: int, guild_id: int = None):
+        bucket = self.everyone if guild_id is None else self.guilds.get(guild_id)
+
+        return bucket.sample(exclude) if bucket else None
@@ -0,0 +1,63 @@
+import logging
+
+logger = logging.getLogger('scurrypy')
+
+from scurrypy import Client
+
+import asyncio
+from typing import Awaitable, Callable
+
+from .metrics import METRICS
+
+QUEUE_SIZE = 1000
+WORKERS = 4
+
+# side effects the user isn't waiting on, like pinging a robbed player, run here after the response
+class TaskQueue:
+    def __init__(self, client: Client, max_size: int = QUEUE_SIZE, workers: int = WORKERS):
+        self.workers = workers
+
+        self.queue: asyncio.Queue[tuple[Callable[..., Awaitable], tuple]] = asyncio.Queue(max_size)
+        self.worker_tasks: list[asyncio.Task] = []
+        self.closed = False
+        self.failed = 0
+
+        METRICS.add_gauge('task_queue_size', self.queue.qsize)
+        METRICS.add_gauge('task_queue_failed', lambda: self.failed)
+
+        client.add_startup_hook(self.start_workers)
+        client.add_shutdown_hook(self.close)
+
+    async def start_workers(self):
+        self.worker_tasks = [asyncio.create_task(self.work()) for _ in range(self.workers)]
+
+    async def submit(self, job: Callable[..., Awaitable], *args):
+        # waits while the queue is full, so a slow Discord slows producers instead of growing memory
+        if self.closed:
+            logger.warning(f"Task queue closed, dropped {job.__qualname__}")
+            return
+
+        await self.queue.put((job, args))
+
+    async def work(self):
+        while True:
+            job, args = await self.queue.get()
+
+            try:
+                with METRICS.timer('task_seconds', task=job.__qualname__):
+                    await job(*args)
+            except Exception:
+                self.failed += 1
+                logger.exception(f"Background task {job.__qualname__} failed")
+            finally:
+                self.queue.task_done()
+
+    async def close(self):
+        self.closed = True
+
+        # drain what was accepted while the HTTP session and pool are still open
+        if self.worker_tasks:
+            await self.queue.join()
+
+        for task in self.worker_tasks:
+            task.cancel()
@@ -0,0 +1,275 @@
+import logging
+from rich.logging import RichHandler
+
+logger = logging.getLogger('launcher')
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(message)s",
+    datefmt="[%X]",
+    handlers=[RichHandler(show_path=False, rich_tracebacks=True)],
+)
+
+import asyncio
+import multiprocessing
+import os
+import re
+import signal
+import time
+
+from game.db import POOL_MIN_SIZE
+from game.shards import ShardCoordinator
+
+# workers run their shutdown hooks, each capped at 60s by scurrypy, before they are killed
+SHUTDOWN_TIMEOUT = 75
+STARTUP_TIMEOUT = 120
+RESTART_DELAY = 5
+SCRAPE_TIMEOUT = 2
+
+SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (.*)$')
+
+def run_worker(worker_id: int, workers: int, shard_ids: list[int], shard_count: int, pool_size: int, metrics_port: int, coordinator: ShardCoordinator):
+    # Ctrl+C reaches the launcher only, which then stops every worker exactly once
+    os.setpgrp()
+
+    os.environ.update({
+        'WORKER_ID': str(worker_id),
+        'WORKER_COUNT': str(workers),
+        'SHARD_IDS': ','.join(map(str, shard_ids)),
+        'SHARD_COUNT': str(shard_count),
+        'DB_POOL_MIN': str(min(POOL_MIN_SIZE, pool_size)),
+        'DB_POOL_MAX': str(pool_size),
+        'METRICS_PORT': str(metrics_port),
+    })
+
+    import main
+
+    main.client.coordinator = coordinator
+    main.client.run()
+
+class Worker:
+    def __init__(self, worker_id: int, shard_ids: list[int], metrics_port: int):
+        self.worker_id = worker_id
+        self.shard_ids = shard_ids
+        self.metrics_port = metrics_port
+
+        self.process: multiprocessing.Process = None
+        self.restarts = 0
+        self.scraped = False
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+class Launcher:
+    def __init__(self, workers: int, shards: int, db_connections: int, host: str, metrics_port: int):
+        self.ctx = multiprocessing.get_context('spawn')
+        self.coordinator = ShardCoordinator(self.ctx)
+
+        self.shard_count = shards
+        self.pool_size = max(1, db_connections // workers)
+        self.host = host
+        self.metrics_port = metrics_port
+
+        # round robin, so every worker has a shard in the first identify batches
+        self.workers = [
+            Worker(i, list(range(i, shards, workers)), metrics_port + 1 + i)
+            for i in range(workers)
+        ]
+
+        self.stopping = False
+
+    def spawn(self, worker: Worker):
+        worker.process = self.ctx.Process(
+            target=run_worker,
+            args=(worker.worker_id, len(self.workers), worker.shard_ids, self.shard_count, self.pool_size, worker.metrics_port, self.coordinator),
+            name=f"worker-{worker.worker_id}"
+        )
+        worker.process.start()
+
+        logger.info(f"Worker {worker.worker_id} (pid {worker.process.pid}) runs shards {worker.shard_ids}")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop)
+
+        server = await asyncio.start_server(self.respond, self.host, self.metrics_port)
+        logger.info(f"Serving aggregated metrics on http://{self.host}:{self.metrics_port}/metrics")
+
+        for worker in self.workers:
+            self.spawn(worker)
+
+        # nobody identifies until every worker has loaded its state, then shards take global turns
+        if not await asyncio.to_thread(self.coordinator.wait_ready, len(self.workers), STARTUP_TIMEOUT):
+            logger.warning("Not every worker became ready in time, starting shards anyway")
+
+        self.coordinator.release()
+
+        await self.supervise()
+
+        server.close()
+        await server.wait_closed()
+
+    async def supervise(self):
+        while not self.stopping:
+            await asyncio.sleep(1)
+
+            for worker in self.workers:
+                if self.stopping or worker.alive:
+                    continue
+
+                logger.error(f"Worker {worker.worker_id} exited with {worker.process.exitcode}, restarting in {RESTART_DELAY}s")
+
+                await asyncio.sleep(RESTART_DELAY)
+
+                if not self.stopping:
+                    worker.restarts += 1
+                    self.spawn(worker)
+
+        await asyncio.to_thread(self.join)
+
+    def stop(self):
+        if self.stopping:
+            return
+
+        self.stopping = True
+        logger.info("Stopping workers...")
+
+        for worker in self.workers:
+            if worker.alive:
+                os.kill(worker.process.pid, signal.SIGINT)
+
+    def join(self):
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+
+            worker.process.join(max(0, deadline - time.monotonic()))
+
+            if worker.process.is_alive():
+                logger.warning(f"Worker {worker.worker_id} did not stop in time, killing it")
+                worker.process.kill()
+                worker.process.join()
+
+    async def scrape(self, worker: Worker):
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', worker.metrics_port), SCRAPE_TIMEOUT)
+
+            try:
+                writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+                response = await asyncio.wait_for(reader.read(), SCRAPE_TIMEOUT)
+            finally:
+                writer.close()
+        except (OSError, asyncio.TimeoutError):
+            worker.scraped = False
+            return ''
+
+        head, _, body = response.partition(b'\r\n\r\n')
+        worker.scraped = head.startswith(b'HTTP/1.1 200')
+
+        return body.decode() if worker.scraped else ''
+
+    async def render(self):
+        bodies = await asyncio.gather(*(self.scrape(worker) for worker in self.workers))
+
+        # the exposition format wants each metric's samples together, so workers are merged per family
+        families: dict[str, list[str]] = {}
+
+        for worker, body in zip(self.workers, bodies):
+            family = None
+
+            for line in body.splitlines():
+                if line.startswith('# TYPE '):
+                    family = line.split()[2]
+                    families.setdefault(family, [line])
+                    continue
+
+                match = SAMPLE_LINE.match(line)
+
+                if family is None or not match:
+                    continue
+
+                name, labels, value = match.groups()
+                labels = f'worker="{worker.worker_id}"' + (f',{labels}' if labels else '')
+
+                families[family].append(f"{name}{{{labels}}} {value}")
+
+        lines = [line for family in families.values() for line in family]
+
+        lines.append("# TYPE launcher_worker_up gauge")
+        lines += [f'launcher_worker_up{{worker="{w.worker_id}"}} {int(w.alive)}' for w in self.workers]
+
+        lines.append("# TYPE launcher_worker_scraped gauge")
+        lines += [f'launcher_worker_scraped{{worker="{w.worker_id}"}} {int(w.scraped)}' for w in self.workers]
+
+        lines.append("# TYPE launcher_worker_restarts gauge")
+        lines += [f'launcher_worker_restarts{{worker="{w.worker_id}"}} {w.restarts}' for w in self.workers]
+
+        return '\n'.join(lines) + '\n'
+
+    async def health(self):
+        await asyncio.gather(*(self.scrape(worker) for worker in self.workers))
+
+        healthy = all(w.alive and w.scraped for w in self.workers)
+
+        body = '\n'.join(
+            f"worker {w.worker_id}: {'up' if w.alive else 'down'}, metrics {'ok' if w.scraped else 'unreachable'}, "
+            + f"{w.restarts} restarts, shards {w.shard_ids}"
+            for w in self.workers
+        ) + '\n'
+
+        return ('200 OK' if healthy else '503 Service Unavailable'), body
+
+    async def respond(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+
+            while (await reader.readline()).strip():
+                pass
+
+            path = request_line.split()[1:2]
+
+            if path == [b'/metrics']:
+                status, body = '200 OK', await self.render()
+            elif path == [b'/health']:
+                status, body = await self.health()
+            else:
+                status, body = '404 Not Found', 'not found\n'
+
+            payload = body.encode()
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode()
+                + payload
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the bot as several processes, each with a share of the gateway shards.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes (default: one per core)")
+    parser.add_argument('--shards', type=int, default=None, help="total gateway shards (default: one per worker)")
+    parser.add_argument('--db-connections', type=int, default=40, help="Postgres connections shared by all workers' pools")
+    parser.add_argument('--host', default='127.0.0.1', help="address for the aggregated metrics and health endpoints")
+    parser.add_argument('--metrics-port', type=int, default=9100, help="aggregated endpoint port, workers use the ports after it")
+
+    args = parser.parse_args()
+
+    shards = args.shards or args.workers
+
+    if shards < args.workers:
+        parser.error("need at least one shard per worker")
+
+    if args.db_connections < args.workers:
+        parser.error("need at least one database connection per worker")
+
+    asyncio.run(Launcher(args.workers, shards, args.db_connections, args.host, args.metrics_port).run())
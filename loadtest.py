@@ -0,0 +1,264 @@
+import os
+os.environ.setdefault('BETA_TOKEN', 'loadtest')
+os.environ.setdefault('DB_PASSWORD', '')
+
+import logging
+logging.disable(logging.INFO)
+
+import asyncio
+import inspect
+import random
+import time
+from types import SimpleNamespace
+
+from scurrypy.api import EmojiModel
+
+import main
+from game.metrics import METRICS
+
+# simulated players get ids far above real snowflakes so they are easy to find and remove
+FIRST_USER_ID = 9 * 10 ** 18
+FIRST_GUILD_ID = 8 * 10 ** 18
+
+EMOJI_NAMES = [
+    'acorn', 'flaming_acorn', 'frozen_acorn', 'corrupt_acorn', 'heart', 'empty_heart',
+    'broken_heart', 'space', 'stash', 'highscore', 'bullet'
+]
+
+PERCENTILES = (0.5, 0.95, 0.99, 0.999)
+
+def stub_emojis():
+    main.app_emojis.emojis = {
+        name: EmojiModel(name, id=1_000_000 + i)
+        for i, name in enumerate(EMOJI_NAMES)
+    }
+
+def percentile(samples: list[float], q: float):
+    return samples[min(len(samples) -1, int(q * len(samples)))] if samples else 0.0
+
+class Stats:
+    def __init__(self):
+        # handler name -> latencies in seconds
+        self.latencies: dict[str, list[float]] = {}
+        self.rejected: dict[str, int] = {}
+        self.failed: dict[str, int] = {}
+
+    def record(self, name: str, seconds: float):
+        self.latencies.setdefault(name, []).append(seconds)
+
+    def reject(self, name: str):
+        self.rejected[name] = self.rejected.get(name, 0) + 1
+
+    def fail(self, name: str):
+        self.failed[name] = self.failed.get(name, 0) + 1
+
+class FakeChannel:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def send(self, content: str):
+        await discord_call(self.latency)
+
+async def discord_call(latency: float):
+    # stands in for the interaction callback round trip
+    with METRICS.phase('discord'):
+        if latency:
+            await asyncio.sleep(latency)
+
+class FakeContext:
+    def __init__(self, user: 'FakePlayer'):
+        self.user = SimpleNamespace(id=user.user_id, username=f"player{user.user_id - FIRST_USER_ID}", avatar=None)
+        self.member = SimpleNamespace(nick=None)
+        self.event = SimpleNamespace(guild_id=user.guild_id)
+        self.channel = FakeChannel(user.latency)
+
+        self.latency = user.latency
+        self.components = None
+        self.ephemeral: str = None
+
+    async def respond(self, message, ephemeral: bool = False):
+        await discord_call(self.latency)
+
+        if ephemeral:
+            self.ephemeral = message
+        else:
+            self.components = message.components
+
+    async def update(self, embeds=None, components=None):
+        await discord_call(self.latency)
+
+        self.components = components
+
+class FakePlayer:
+    def __init__(self, user_id: int, guild_id: int, rate: float, leaderboard_share: float, latency: float, stats: Stats):
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.rate = rate
+        self.leaderboard_share = leaderboard_share
+        self.latency = latency
+        self.stats = stats
+
+        self.buttons: list[str] = []
+
+    async def call(self, handler, *args):
+        ctx = FakeContext(self)
+        start = time.perf_counter()
+
+        try:
+            await handler(ctx, *args)
+        except Exception:
+            self.stats.fail(handler.__name__)
+            return None
+
+        self.stats.record(handler.__name__, time.perf_counter() - start)
+
+        if ctx.ephemeral:
+            self.stats.reject(handler.__name__)
+            return None
+
+        return ctx.components
+
+    async def press(self, custom_id: str):
+        handler, cid = main.router.route(custom_id)
+
+        return await self.call(handler, cid)
+
+    def read_buttons(self, components):
+        self.buttons = [button.custom_id for row in components or [] for button in row.components if not button.disabled]
+
+    async def start(self):
+        self.read_buttons(await self.call(main.on_start))
+
+        if self.buttons:
+            self.read_buttons(await self.press(self.buttons[0]))
+
+    async def click(self):
+        if random.random() < self.leaderboard_share:
+            await self.call(main.on_leaderboard)
+            return
+
+        if not self.buttons:
+            await self.start()
+            return
+
+        components = await self.press(random.choice(self.buttons))
+
+        if components:
+            self.read_buttons(components)
+
+    async def run(self, until: float):
+        # spread first clicks over one think time so players don't arrive in lockstep
+        await asyncio.sleep(random.expovariate(self.rate))
+        await self.start()
+
+        while time.perf_counter() < until:
+            await asyncio.sleep(random.expovariate(self.rate))
+            await self.click()
+
+def is_offline_hook(hook):
+    # scurrypy addons would call Discord and the metrics server would bind a port, the game's own hooks are kept
+    owner = getattr(hook, '__self__', None)
+
+    return owner is None or (type(owner).__module__.startswith('game.') and owner is not main.metrics_server)
+
+async def run_hooks(hooks):
+    for hook in filter(is_offline_hook, hooks):
+        result = hook()
+
+        if inspect.isawaitable(result):
+            await result
+
+async def remove_players(count: int):
+    async with main.db.connection() as conn:
+        await conn.execute("delete from move where user_id >= $1 and user_id < $2", FIRST_USER_ID, FIRST_USER_ID + count)
+        await conn.execute("delete from player where user_id >= $1 and user_id < $2", FIRST_USER_ID, FIRST_USER_ID + count)
+
+def report(stats: Stats, elapsed: float):
+    total = sum(len(samples) for samples in stats.latencies.values())
+
+    print(f"\n{total:,} handler calls in {elapsed:.1f}s, {total / elapsed:,.0f}/s\n")
+    print(f"{'handler':<16} {'calls':>8} {'rejected':>9} {'failed':>7} " + ' '.join(f"{'p' + format(q * 100, 'g'):>8}" for q in PERCENTILES) + f" {'max':>8}")
+
+    for name, samples in sorted(stats.latencies.items()):
+        samples.sort()
+
+        print(
+            f"{name:<16} {len(samples):>8,} {stats.rejected.get(name, 0):>9,} {stats.failed.get(name, 0):>7,} "
+            + ' '.join(f"{percentile(samples, q) * 1000:>7.1f}ms" for q in PERCENTILES)
+            + f" {samples[-1] * 1000:>7.1f}ms"
+        )
+
+    pool = main.db.metrics
+    acquire = METRICS.histogram('db_acquire_seconds')
+
+    print(f"\npool: {main.db.max_size} connections, {pool.acquisitions:,} acquisitions, {pool.saturated:,} while saturated "
+        + f"({pool.saturated / max(pool.acquisitions, 1):.1%})")
+    print(f"pool wait: avg {pool.wait_avg * 1000:.2f}ms, p99 {acquire.quantile(0.99) * 1000:.2f}ms, max {pool.wait_max * 1000:.2f}ms")
+
+    print(f"\n{'handler':<16} " + ' '.join(f"{p:>10}" for p in ('db', 'render', 'discord', 'total')) + "  (mean ms)")
+
+    for name in sorted(stats.latencies):
+        means = [
+            h.total / h.count * 1000 if (h := METRICS.phases.get((name, p))) and h.count else 0.0
+            for p in ('db', 'render', 'discord', 'total')
+        ]
+
+        print(f"{name:<16} " + ' '.join(f"{m:>10.2f}" for m in means))
+
+async def main_loadtest(players: int, rate: float, duration: float, guilds: int, leaderboard_share: float, latency: float, pool_size: int, keep: bool):
+    if pool_size:
+        main.db.max_size = pool_size
+        main.db.min_size = min(main.db.min_size, pool_size)
+
+    stub_emojis()
+    await run_hooks(main.client.startup_hooks)
+
+    stats = Stats()
+    fakes = [
+        FakePlayer(FIRST_USER_ID + i, FIRST_GUILD_ID + i % guilds, rate, leaderboard_share, latency, stats)
+        for i in range(players)
+    ]
+
+    print(f"{players:,} players clicking {rate:g}/s each across {guilds} guilds for {duration:g}s")
+
+    start = time.perf_counter()
+
+    try:
+        await asyncio.gather(*(p.run(start + duration) for p in fakes))
+    finally:
+        elapsed = time.perf_counter() - start
+
+        if not keep:
+            # neither the cache nor the move log may write the removed rows back afterwards, close also waits out a running flush
+            await main.players.close()
+
+            if main.move_log:
+                await main.move_log.close()
+
+            await remove_players(players)
+            main.players.players.clear()
+            main.players.dirty.clear()
+
+        await run_hooks(main.client.shutdown_hooks)
+
+    report(stats, elapsed)
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Drive the bot's handlers with simulated players against a local Postgres.")
+    parser.add_argument('--players', type=int, default=1000, help="concurrent simulated players")
+    parser.add_argument('--rate', type=float, default=0.5, help="clicks per second per player")
+    parser.add_argument('--duration', type=float, default=30, help="seconds to run")
+    parser.add_argument('--guilds', type=int, default=10, help="guilds the players are spread across")
+    parser.add_argument('--leaderboard-share', type=float, default=0.02, help="fraction of clicks that open the leaderboard")
+    parser.add_argument('--discord-latency', type=float, default=0.0, help="simulated Discord round trip in seconds")
+    parser.add_argument('--pool-size', type=int, default=0, help="override the connection pool's max size")
+    parser.add_argument('--keep', action='store_true', help="keep the simulated players' rows afterwards")
+
+    args = parser.parse_args()
+
+    asyncio.run(main_loadtest(
+        args.players, args.rate, args.duration, args.guilds, args.leaderboard_share,
+        args.discord_latency, args.pool_size, args.keep
+    ))
@@ -1,4 +1,6 @@
 import os
+import secrets
+import uuid
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -21,7 +23,6 @@ logging.basicConfig(
     handlers=[RichHandler(show_path=False, rich_tracebacks=True)],
 )
 
-from scurrypy import Client
 from scurrypy.enums import ButtonStyle
 from scurrypy.api import EmojiModel
 from scurrypy.api.messages import MessagePart, Embed, EmbedField, EmbedImage, EmbedFooter, EmbedThumbnail
@@ -32,23 +33,85 @@ from scurrypy.ext.commands import CommandsAddon, ApplicationCommandContext
 from scurrypy.ext.components import ComponentsAddon, MessageComponentContext
 from scurrypy.ext.cache import ApplicationEmojisCacheAddon
 
-client = Client(token=TOKEN)
-commands = CommandsAddon(client, APP_ID)
+from game import PostgresDB, PlayerCache, TargetPool, SessionMap, ClickRegistry, TaskQueue, RandomStreams, Card, Player, CardEvent, SelectResult, Leaderboard, LeaderboardSummary, MAX_HEALTH
+from game import engine
+from game.custom_ids import CustomId, CustomIdCodec, ComponentRouter, session_token, NO_SESSION, START, SELECT, RESTART, HELP_FIRST, HELP_BACK, HELP_NEXT, HELP_LAST, LB_FIRST, LB_BACK, LB_NEXT, LB_LAST
+from game.card import CARDS
+from game.db import POOL_MIN_SIZE, POOL_MAX_SIZE
+from game.leaderboard import LEADERBOARD_REFRESH
+from game.metrics import MetricsServer, InstrumentedHTTPClient, instrument, phase
+from game.move_log import MoveLog, SNAPSHOT_INTERVAL
+from game.player_cache import FLUSH_INTERVAL
+from game.shards import ShardedClient
+
+# set by launcher.py when the bot runs as several processes
+WORKER_ID = int(os.getenv('WORKER_ID', 0))
+WORKER_COUNT = int(os.getenv('WORKER_COUNT', 1))
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv('SHARD_IDS').split(',')] if os.getenv('SHARD_IDS') else None
+
+client = ShardedClient(token=TOKEN, http=InstrumentedHTTPClient(), shard_count=int(os.getenv('SHARD_COUNT', 0)), shard_ids=SHARD_IDS)
+# one worker syncing slash commands is enough, every worker still handles them
+commands = CommandsAddon(client, APP_ID, sync_commands=WORKER_ID == 0)
+
 components = ComponentsAddon(client)
 app_emojis = ApplicationEmojisCacheAddon(client, APP_ID)
+metrics_server = MetricsServer(client, port=int(os.getenv('METRICS_PORT', 9100)))
+
+# registered first so queued side effects drain before the pool closes
+tasks = TaskQueue(client)
+db = PostgresDB(
+    client, 'furmissile', 'squirrels', DB_PASSWORD,
+    host=os.getenv('DB_HOST', 'localhost'),
+    port=int(os.getenv('DB_PORT', 5432)),
+    replica_host=os.getenv('DB_REPLICA_HOST'),
+    replica_port=int(os.getenv('DB_REPLICA_PORT', 5432)),
+    max_replica_lag=float(os.getenv('DB_REPLICA_MAX_LAG', 2.0)),
+    min_size=int(os.getenv('DB_POOL_MIN', POOL_MIN_SIZE)),
+    max_size=int(os.getenv('DB_POOL_MAX', POOL_MAX_SIZE))
+)
+# with MOVE_LOG=1 moves are appended to a log and the player row becomes a less frequent snapshot
+move_log = MoveLog(client, db) if os.getenv('MOVE_LOG') == '1' else None
+players = PlayerCache(
+    client, db,
+    flush_interval=SNAPSHOT_INTERVAL if move_log else FLUSH_INTERVAL,
+    move_log=move_log,
+    is_local=client.serves_guild if WORKER_COUNT > 1 else None
+)
+# other workers' saves never reach these indexes, so they are reloaded from the table now and then
+leaderboard = Leaderboard(client, db, refresh_interval=LEADERBOARD_REFRESH if WORKER_COUNT > 1 else None)
+targets = TargetPool(
+    client, db,
+    refresh_interval=LEADERBOARD_REFRESH if WORKER_COUNT > 1 else None,
+    is_local=client.serves_guild if WORKER_COUNT > 1 else None
+)
+sessions = SessionMap()
+clicks = ClickRegistry()
 
-from game import PostgresDB,  Cards, Card, Player, CardEvent, Leaderboard, MAX_HEALTH, RANKS, SUITS
-db = PostgresDB(client, 'furmissile', 'squirrels', DB_PASSWORD)
+# pirates rob anyone by default
+PIRATE_GUILD_ONLY = os.getenv('PIRATE_SCOPE') == 'guild'
 
-# --- Common Message Formats ---
-def format_custom_id(command: str, user_id: int, session_id: str, *args):
-    return '_'.join([command, str(user_id), session_id] + [f"{n}" for n in args])
+# set RNG_SECRET to replay a session's draws in another process
+streams = RandomStreams(os.getenv('RNG_SECRET') or secrets.token_hex(16))
+
+# set CUSTOM_ID_SECRET to sign custom ids, every worker needs the same one
+codec = CustomIdCodec(os.getenv('CUSTOM_ID_SECRET', '').encode() or None)
+
+# --- Render Cache ---
+# filled once from the application emoji cache, see build_render_cache
+EMOJI_MENTIONS: dict[str, str] = {}
+CARD_LABELS: dict[Card, str] = {}
+HP_BARS: list[str] = []
+HELP_PAGES: dict[int, tuple[str, str, str]] = {}
 
+# --- Common Message Formats ---
+@phase('render')
 def build_player_options(p: Player):
+    token, options = session_token(p.session_id), Card.pack(p.options)
+
     return ActionRow([
         Button(
             style=ButtonStyle.PRIMARY,
-            custom_id=format_custom_id('select', p.user_id, p.session_id, i), 
+            custom_id=codec.encode(SELECT, p.user_id, token, options, p.move_seq, i),
             label=p.options[i].rank,
             emoji=app_emojis.get_emoji(p.options[i].emoji_name)
         )
@@ -57,18 +120,15 @@ def build_player_options(p: Player):
         Button(
             style=ButtonStyle.DANGER,
             label="Restart",
-            custom_id=format_custom_id('restart', p.user_id, p.session_id)
+            custom_id=codec.encode(RESTART, p.user_id, token, options, p.move_seq)
         )
     ])
 
+@phase('render')
 def build_game_embed(ctx: InteractionContext, p: Player, add_pts: int = 0):
-    space = app_emojis.get_emoji('space').mention
-    stash = app_emojis.get_emoji('stash').mention
-    highscore = app_emojis.get_emoji('highscore').mention
-    heart = app_emojis.get_emoji('heart').mention
-    empty_heart = app_emojis.get_emoji('empty_heart').mention
-
-    hp_bar = ' '.join([heart] * p.hp + [empty_heart] * (MAX_HEALTH - p.hp))
+    space = EMOJI_MENTIONS['space']
+    stash = EMOJI_MENTIONS['stash']
+    highscore = EMOJI_MENTIONS['highscore']
 
     embed = Embed(
         title="Foraging...",
@@ -78,12 +138,10 @@ def build_game_embed(ctx: InteractionContext, p: Player, add_pts: int = 0):
                 + (f' +**{add_pts}**' if add_pts else '')
                 + (f" ({highscore} **{p.highscore}**)" if p.highscore > 0 and p.score < p.highscore else '')),
 
-            EmbedField('Hearts', hp_bar),
+            EmbedField('Hearts', HP_BARS[p.hp]),
 
-            EmbedField(f'Hand ({Cards.sum_cards(p.hand)})',
-                f'{space}'.join(
-                    f"{app_emojis.get_emoji(c.emoji_name).mention} **{c.rank}**" 
-                    for c in p.hand) if p.hand else 'No cards.'
+            EmbedField(f'Hand ({p.hand.total})',
+                space.join(CARD_LABELS[c] for c in p.hand) if p.hand else 'No cards.'
             )
         ]
     )
@@ -93,10 +151,10 @@ def build_game_embed(ctx: InteractionContext, p: Player, add_pts: int = 0):
     return embed
 
 def get_suit_emoji(suit: str):
-    return app_emojis.get_emoji(suit).mention
+    return EMOJI_MENTIONS[suit]
 
 def format_card(card: Card):
-    return f"{get_suit_emoji(card.emoji_name)} **{card.rank}**"
+    return CARD_LABELS[card]
 
 def append_event(e: CardEvent):
     description = ""
@@ -111,19 +169,47 @@ def append_event(e: CardEvent):
 
     return description
 
+@phase('render')
+def describe_selection(result: SelectResult):
+    description = ""
+
+    if result.card.rank == 'B':
+        card_one, card_two = result.drawn
+        description += f"\nBookie drew: {format_card(card_one)} + {format_card(card_two)} \n"
+
+    elif result.card.rank == 'P' and result.stolen_from:
+        description += f"\nYou stole a {format_card(result.drawn[0])}! \n"
+
+    elif result.card.rank == 'P':
+        description += f"\n*No targets available.* \nPirate drew: {format_card(result.drawn[0])} \n"
+
+    for e in result.events:
+        description += append_event(e)
+
+    if result.busted:
+        description += f"\n*Busted!* \n-**1** {EMOJI_MENTIONS['broken_heart']} Heart \n"
+
+    return description
+
+async def respond_stale(ctx: MessageComponentContext):
+    await ctx.respond("This appears to be an old message! Try sending `/forage` to renew a session.", ephemeral=True)
+
+router = ComponentRouter(components, codec, on_invalid=respond_stale)
+
 @commands.slash_command('play', 'Begin or resume your game!', guild_ids=[GUILD_ID] if IS_BETA else None)
+@instrument
 async def on_start(ctx: ApplicationCommandContext):
     embed = Embed(
         title=f'Welcome, {ctx.member.nick or ctx.user.username}!',
         image=EmbedImage('https://raw.githubusercontent.com/scurry-works/squirrel-stash/refs/heads/main/assets/welcome.gif')
     )
 
-    import uuid
+    session = uuid.uuid4().bytes
 
     row = ActionRow([
         Button(
             style=ButtonStyle.SUCCESS,
-            custom_id=format_custom_id('start', ctx.user.id, str(uuid.uuid4())),
+            custom_id=codec.encode(START, ctx.user.id, session[:8], session[8:]),
             label="Start",
             emoji=app_emojis.get_emoji('acorn')
         )
@@ -136,33 +222,37 @@ async def on_start(ctx: ApplicationCommandContext):
         )
     )
 
-@components.button('start_*')
-async def on_forage(ctx: MessageComponentContext):
-    _, user_id, session_id = ctx.data.custom_id.split('_')
-
-    if int(user_id) != ctx.user.id:
+@router.button(START)
+@instrument
+@clicks.serialize
+async def on_forage(ctx: MessageComponentContext, cid: CustomId):
+    if cid.user_id != ctx.user.id:
         await ctx.respond("This message belongs to someone else! Send `/forage` to initiate your own forage.", ephemeral=True)
         return
-    
-    conn = await db.get_connection()
 
-    p = await Player(ctx.user.id).fetch(conn)
+    # a double click or a redelivery of the click just handled gets the same message back
+    reply = clicks.replay(ctx.user.id, cid)
+
+    if reply:
+        await ctx.update(embeds=reply.embeds, components=reply.components)
+        return
+    
+    # another worker may have served this player's last session
+    p = await players.refresh(ctx.user.id) if WORKER_COUNT > 1 else await players.fetch(ctx.user.id)
 
     throw_error = False
 
     try:
-        p.session_id = session_id
+        p.session_id = str(uuid.UUID(bytes=cid.session + cid.args[0]))
 
         p.guild_id = ctx.event.guild_id
 
-        await p.save(conn)
+        players.save(p)
 
     except Exception as e:
         await ctx.respond("An error occurred!", ephemeral=True)
         logger.error(e)
         throw_error = True
-    finally:
-        await conn.close()
 
     if throw_error:
         return
@@ -171,170 +261,148 @@ async def on_forage(ctx: MessageComponentContext):
 
     row = build_player_options(p)
 
-    await ctx.update(embeds=[embed], components=[row])
+    clicks.remember(ctx.user.id, cid, MessagePart(embeds=[embed], components=[row]))
 
-@components.button('select_*')
-async def on_select(ctx: MessageComponentContext):
+    await ctx.update(embeds=[embed], components=[row])
 
-    _, user_id, session_id, button_idx = ctx.data.custom_id.split('_')
+@router.button(SELECT)
+@instrument
+@clicks.serialize
+async def on_select(ctx: MessageComponentContext, cid: CustomId):
+    options, _, button_idx = cid.args
 
-    if int(user_id) != ctx.user.id:
+    if cid.user_id != ctx.user.id:
         await ctx.respond("This message belongs to someone else! Send `/forage` to initiate your own forage.", ephemeral=True)
         return
 
-    conn = await db.get_connection()
+    # a double click or a redelivery of the click just handled gets the same message back
+    reply = clicks.replay(ctx.user.id, cid)
 
-    p = await Player(ctx.user.id).fetch(conn)
-    
-    if session_id != p.session_id:
-        await ctx.respond("This appears to be an old message! Try sending `/forage` to renew a session.", ephemeral=True)
-        await conn.close()
+    if reply:
+        await ctx.update(embeds=reply.embeds, components=reply.components)
         return
 
-    select_card = p.options[int(button_idx)]
-    throw_error = False
-
-    add_pts = 0
-    description = ""
-
-    try:
-        import random
-        if select_card.suit == 'HP':
-            p.hp += (1 if p.hp < MAX_HEALTH else 0)
-
-        elif select_card.rank == 'B':
-            rank_one, rank_two = tuple(random.sample(population=RANKS, k=2))
-            suit_one, suit_two = tuple(random.choices(population=SUITS, k=2))
-
-            card_one = Card(suit_one, rank_one)
-            card_two = Card(suit_two, rank_two)
-
-            description = f"\nBookie drew: {format_card(card_one)} + {format_card(card_two)} \n"
-
-            e_one = p.add_card(card_one)
-            e_two = p.add_card(card_two)
-
-            description += append_event(e_one)
-            description += append_event(e_two)
-
-            add_pts = e_one.points + e_two.points
-
-        elif select_card.rank == 'P':
-            # pull all targets with the same guild id and a non-empty hand
-            records = await conn.fetch("select user_id from player where user_id != $1 and hand != '{}' and hp > 0 order by random()", p.user_id)
-
-            if len(records) == 0:
-                card_select = Card.random_rank()
-                description += f"\n*No targets available.* \nPirate drew: {format_card(card_select)} \n"
-            else:
-                random_opponent = random.choice(records)
-                opponent = await Player(random_opponent['user_id']).fetch(conn)
-                card_select = opponent.hand.pop(random.randint(0, len(opponent.hand) -1))
-                await opponent.save(conn)
-
-                description += f"\nYou stole a {format_card(card_select)}! \n"
-                await ctx.channel.send(f"<@{opponent.user_id}>, **{ctx.member.nick or ctx.user.username}** has stolen your {format_card(card_select)}!")
-
-            e = p.add_card(card_select)
-
-            description += append_event(e)
-
-            add_pts = e.points
-
-        elif select_card.rank == 'W':
-            highest_card = Cards.get_highest_card(p.hand)
-            p.hand.remove(highest_card)
+    # known sessions and their dealt options are checked in memory, only a miss reaches the table
+    if sessions.is_stale(ctx.user.id, cid.session, options):
+        await respond_stale(ctx)
+        return
 
-            e = CardEvent(points=2 * highest_card.value)
+    p = await players.fetch(ctx.user.id)
+    
+    if cid.session != session_token(p.session_id) or options != Card.pack(p.options):
+        sessions.track(p)
 
-            p.hand = e.check_21(p.hand, highest_card)
+        await respond_stale(ctx)
+        return
 
-            e.is_match = not e.is_stash and Cards.all_one_suit([select_card, highest_card])
+    throw_error = False
 
-            if e.is_match:
-                e.match_suit = select_card.emoji_name
-                e.points *=2
+    # the cached player is moved in place, so a move that fails partway is rolled back
+    snapshot = p.column_values()
+    stolen, target_id = None, None
 
-            p.score += e.points
+    try:
+        if p.options[button_idx].rank == 'P':
+            # pick a target with a non-empty hand, from the same guild with PIRATE_SCOPE=guild
+            target_id = targets.sample(p.user_id, p.guild_id if PIRATE_GUILD_ONLY else None)
 
-            description += append_event(e)
-            
-            add_pts = e.points
-        
-        else: 
-            e = p.add_card(select_card)
+            stolen = await players.steal(target_id) if target_id else None
 
-            description += append_event(e)
+        result = engine.select(p, button_idx, stolen, target_id, streams.get(p.session_id, p.move_seq))
 
-            add_pts = e.points
+        players.save(p)
 
-        if Cards.sum_cards(p.hand) > 21:
-            p.hp -= 1
-            description += f"\n*Busted!* \n-**1** {app_emojis.get_emoji('broken_heart').mention} Heart \n"
+        # logged last, so the log never holds a move that was rolled back
+        if move_log:
+            move_log.log_select(p, button_idx, result)
+    except Exception as e:
+        # the save hooks may already have seen the move, so the indexes are given the restored player
+        p.restore(snapshot)
+        p.run_save_hooks()
 
-        p.new_options()
+        if stolen:
+            await players.give_back(target_id, stolen)
 
-        await p.save(conn)
-    except Exception as e:
         await ctx.respond("An error occurred!", ephemeral=True)
         logger.error(e)
         throw_error = True
-    finally:
-        await conn.close()
 
     if throw_error:
         return
 
+    add_pts = result.points
+    description = describe_selection(result)
+
     embed = build_game_embed(ctx, p, add_pts)
 
     embed.description = description
 
     row = build_player_options(p)
 
+    clicks.remember(ctx.user.id, cid, MessagePart(embeds=[embed], components=[row]))
+
     await ctx.update(embeds=[embed], components=[row])
 
-@components.button('restart_*')
-async def on_restart(ctx: MessageComponentContext):
-    _, user_id, session_id = ctx.data.custom_id.split('_')
+    if result.stolen_from:
+        await tasks.submit(ctx.channel.send, f"<@{result.stolen_from}>, **{ctx.member.nick or ctx.user.username}** has stolen your {format_card(result.drawn[0])}!")
+
+@router.button(RESTART)
+@instrument
+@clicks.serialize
+async def on_restart(ctx: MessageComponentContext, cid: CustomId):
+    options, _ = cid.args
 
-    if int(user_id) != ctx.user.id:
+    if cid.user_id != ctx.user.id:
         await ctx.respond("This message belongs to someone else! Send `/forage` to initiate your own forage.", ephemeral=True)
         return
 
-    conn = await db.get_connection()
+    # a double click or a redelivery of the click just handled gets the same message back
+    reply = clicks.replay(ctx.user.id, cid)
 
-    p = await Player(ctx.user.id).fetch(conn)
+    if reply:
+        await ctx.update(embeds=reply.embeds, components=reply.components)
+        return
+
+    # known sessions and their dealt options are checked in memory, only a miss reaches the table
+    if sessions.is_stale(ctx.user.id, cid.session, options):
+        await respond_stale(ctx)
+        return
+
+    p = await players.fetch(ctx.user.id)
     
-    if session_id != p.session_id:
-        await ctx.respond("This appears to be an old message! Try sending `/forage` to renew a session.", ephemeral=True)
-        await conn.close()
+    if cid.session != session_token(p.session_id) or options != Card.pack(p.options):
+        sessions.track(p)
+
+        await respond_stale(ctx)
         return
     
     throw_error = False
 
+    snapshot = p.column_values()
+
     try:
-        reset_p = Player(
-            ctx.user.id, 
-            p.session_id, 
-            highscore = p.score if p.score > p.highscore else p.highscore,
-        )
+        engine.restart(p, streams.get(p.session_id, p.move_seq))
 
-        reset_p.new_options()
+        players.save(p)
 
-        await reset_p.save(conn)
+        if move_log:
+            move_log.log_restart(p)
     except Exception as e:
+        p.restore(snapshot)
+        p.run_save_hooks()
+
         await ctx.respond("An error occurred!", ephemeral=True)
         logger.error(e)
         throw_error = True
-    finally:
-        await conn.close()
 
     if throw_error:
         return
     
-    embed = build_game_embed(ctx, reset_p)
+    embed = build_game_embed(ctx, p)
 
-    row = build_player_options(reset_p)
+    row = build_player_options(p)
+
+    clicks.remember(ctx.user.id, cid, MessagePart(embeds=[embed], components=[row]))
 
     await ctx.update(embeds=[embed], components=[row])
 
@@ -363,7 +431,7 @@ GAME_HELP = {
             "Face cards include the Bookie (B), Pirate (P), and Wizard (W).",
             "Face cards are executed immediately upon selecting and do NOT go in hand.",
             "**Bookie (B)**: Draw **2** random cards.",
-            "**Pirate (P)**: Steal a random card from a random player. If no targets available, draws a card instead.",
+            f"**Pirate (P)**: Steal a random card from a random player{' in this server' if PIRATE_GUILD_ONLY else ''}. If no targets available, draws a card instead.",
             "**Wizard (W)**: Stash the highest-value card in your hand for **double** its value (as if matched)."
         ]),
     4: wrap_help_field('Support', [
@@ -373,6 +441,28 @@ GAME_HELP = {
 
 GAME_HELP_SIZE = len(GAME_HELP)
 
+def render_help_page(help_field: EmbedField, page_num: int):
+    return (
+        help_field.name.format(acorn=EMOJI_MENTIONS['acorn']),
+        help_field.value.format(space=EMOJI_MENTIONS['space'], bullet=EMOJI_MENTIONS['bullet']),
+        f"Page {page_num +1} of {GAME_HELP_SIZE}"
+    )
+
+def build_render_cache():
+    EMOJI_MENTIONS.update({name: emoji.mention for name, emoji in app_emojis.emojis.items()})
+
+    CARD_LABELS.update({c: f"{EMOJI_MENTIONS[c.emoji_name]} **{c.rank}**" for c in CARDS.values()})
+
+    HP_BARS[:] = [
+        ' '.join([EMOJI_MENTIONS['heart']] * hp + [EMOJI_MENTIONS['empty_heart']] * (MAX_HEALTH - hp))
+        for hp in range(MAX_HEALTH +1)
+    ]
+
+    HELP_PAGES.update({page_num: render_help_page(help_field, page_num) for page_num, help_field in GAME_HELP.items()})
+
+# runs after the emoji cache addon has loaded its emojis
+client.add_startup_hook(build_render_cache)
+
 def build_button(cond: bool, custom_id: str, emoji: str):
     button = Button(
         custom_id=custom_id,
@@ -387,33 +477,29 @@ def build_button(cond: bool, custom_id: str, emoji: str):
 
     return button
 
+@phase('render')
 def build_help_message(ctx: InteractionContext, page_num: int):
-    acorn = app_emojis.get_emoji('acorn').mention
-    space = app_emojis.get_emoji('space').mention
-    bullet = app_emojis.get_emoji('bullet').mention
-
-    help_field = GAME_HELP.get(page_num)
+    page = HELP_PAGES.get(page_num)
 
-    if not help_field:
-        help_field = wrap_help_field("Uh oh!", ["Looks like you came across an error!"])
+    if not page:
+        page = render_help_page(wrap_help_field("Uh oh!", ["Looks like you came across an error!"]), page_num)
 
-    help_field.name = help_field.name.format(acorn=acorn)
-    help_field.value = help_field.value.format(space=space, bullet=bullet)
+    name, value, footer = page
 
     embed = Embed(
         title='Help Pages',
-        fields=[help_field],
-        footer=EmbedFooter(f"Page {page_num +1} of {GAME_HELP_SIZE}")
+        fields=[EmbedField(name, value)],
+        footer=EmbedFooter(footer)
     )
     embed.set_user_author(ctx.user)
 
-    first = build_button(page_num == 0, f"help start_{ctx.user.id}_0", '⏮️')
+    first = build_button(page_num == 0, codec.encode(HELP_FIRST, ctx.user.id, NO_SESSION, 0), '⏮️')
 
-    previous = build_button(page_num -1 < 0, f"help back_{ctx.user.id}_{page_num -1}", '⏪')
+    previous = build_button(page_num -1 < 0, codec.encode(HELP_BACK, ctx.user.id, NO_SESSION, page_num -1), '⏪')
 
-    next = build_button(page_num +1 == GAME_HELP_SIZE, f"help next_{ctx.user.id}_{page_num +1}", '⏩')
+    next = build_button(page_num +1 == GAME_HELP_SIZE, codec.encode(HELP_NEXT, ctx.user.id, NO_SESSION, page_num +1), '⏩')
 
-    last = build_button(page_num == GAME_HELP_SIZE -1, f"help end_{ctx.user.id}_{GAME_HELP_SIZE -1}", '⏭️')
+    last = build_button(page_num == GAME_HELP_SIZE -1, codec.encode(HELP_LAST, ctx.user.id, NO_SESSION, GAME_HELP_SIZE -1), '⏭️')
 
     row = ActionRow([first, previous, next, last])
 
@@ -423,85 +509,126 @@ def build_help_message(ctx: InteractionContext, page_num: int):
     )
 
 @commands.slash_command('help', 'Need some assistance?', guild_ids=GUILD_ID if IS_BETA else None)
+@instrument
 async def on_help(ctx: ApplicationCommandContext):
     await ctx.respond(build_help_message(ctx, 0))
 
-async def respond_help(ctx: MessageComponentContext):
-    _, user_id, page_num = ctx.data.custom_id.split('_')
+async def respond_help(ctx: MessageComponentContext, cid: CustomId):
+    page_num, = cid.args
 
-    if int(user_id) != ctx.user.id:
+    if cid.user_id != ctx.user.id:
         await ctx.respond("This message belongs to someone else! Send `/help` to initiate your own help pages.", ephemeral=True)
         return
 
-    msg = build_help_message(ctx, int(page_num))
+    msg = build_help_message(ctx, page_num)
     await ctx.update(embeds=msg.embeds, components=msg.components)
 
-@components.button('help start_*_0')
-async def on_to_start(ctx: MessageComponentContext):
-    await respond_help(ctx)
+@router.button(HELP_FIRST)
+@instrument
+async def on_to_start(ctx: MessageComponentContext, cid: CustomId):
+    await respond_help(ctx, cid)
+
+@router.button(HELP_BACK)
+@instrument
+async def on_back_page(ctx: MessageComponentContext, cid: CustomId):
+    await respond_help(ctx, cid)
+
+@router.button(HELP_NEXT)
+@instrument
+async def on_next_page(ctx: MessageComponentContext, cid: CustomId):
+    await respond_help(ctx, cid)
+
+@router.button(HELP_LAST)
+@instrument
+async def on_to_end(ctx: MessageComponentContext, cid: CustomId):
+    await respond_help(ctx, cid)
+
+@phase('render')
+def build_leaderboard_message(ctx: InteractionContext, summary: LeaderboardSummary):
+    footer = '⭐ Your Rank: Unranked | Global Rank: Unranked'
+
+    if summary.global_player:
+        if not summary.local_player:
+            footer = f'⭐ Your Rank: Unranked | Global Rank: #{summary.global_player.rank}'
+        else:
+            footer = f'⭐ Your Rank: #{summary.local_player.rank} | Global Rank: #{summary.global_player.rank}'
+
+    space = EMOJI_MENTIONS['space']
+
+    fmt_entries = '\n'.join([
+        f"{space} **{e.rank}.**  <@{e.user_id}> - **{e.best_score}**"
+        for e in summary.entries
+    ])
+
+    embed = Embed(
+        title='Leaderboard',
+        thumbnail=EmbedThumbnail('https://raw.githubusercontent.com/scurry-works/squirrel-stash/refs/heads/main/assets/bookie.png'),
+        description=fmt_entries,
+        footer=EmbedFooter(f"{footer} | {summary.entries[0].rank}-{summary.entries[-1].rank} of {summary.page.total}")
+    )
+
+    # buttons carry the (best_score, user_id) of the page edge they continue from
+    first_entry, last_entry = summary.entries[0], summary.entries[-1]
+
+    first = build_button(not summary.page.has_previous, codec.encode(LB_FIRST, ctx.user.id), '⏮️')
+
+    previous = build_button(not summary.page.has_previous, codec.encode(LB_BACK, ctx.user.id, NO_SESSION, first_entry.best_score, first_entry.user_id), '⏪')
 
-@components.button('help back_*')
-async def on_back_page(ctx: MessageComponentContext):
-    await respond_help(ctx)
+    next = build_button(not summary.page.has_next, codec.encode(LB_NEXT, ctx.user.id, NO_SESSION, last_entry.best_score, last_entry.user_id), '⏩')
 
-@components.button('help next_*')
-async def on_next_page(ctx: MessageComponentContext):
-    await respond_help(ctx)
+    last = build_button(not summary.page.has_next, codec.encode(LB_LAST, ctx.user.id), '⏭️')
 
-@components.button(f"help end_*_{GAME_HELP_SIZE -1}")
-async def on_to_end(ctx: MessageComponentContext):
-    await respond_help(ctx)
+    row = ActionRow([first, previous, next, last])
+
+    return MessagePart(
+        embeds=[embed],
+        components=[row]
+    )
 
 @commands.slash_command('leaderboard', 'Check out the biggest hoarders around!', guild_ids=[GUILD_ID] if IS_BETA else None)
+@instrument
 async def on_leaderboard(ctx: ApplicationCommandContext):
+    summary = leaderboard.fetch_summary(ctx.event.guild_id, ctx.user.id)
 
-    conn = await db.get_connection()
-    footer = EmbedFooter('⭐ Your Rank: Unranked | Global Rank: Unranked')
-    
-    try:
-        leaderboard = Leaderboard()
+    if not summary.entries:
+        await ctx.respond("No records could be found! Please try again later.", ephemeral=True)
+        return
 
-        entries = await leaderboard.fetch(conn, ctx.event.guild_id)
+    await ctx.respond(build_leaderboard_message(ctx, summary))
 
-        if not entries:
-            await ctx.respond("No records could be found! Please try again later.", ephemeral=True)
-            await conn.close()
-            return
-        
-        is_player = await Player(ctx.user.id).fetch(conn, False)
+async def respond_leaderboard(ctx: MessageComponentContext, direction: str, cid: CustomId):
+    if cid.user_id != ctx.user.id:
+        await ctx.respond("This message belongs to someone else! Send `/leaderboard` to view your own leaderboard.", ephemeral=True)
+        return
 
-        if is_player:
-            global_player = await leaderboard.fetch_global_player(conn, ctx.user.id)
+    summary = leaderboard.fetch_summary(ctx.event.guild_id, ctx.user.id, direction, cid.args or None)
 
-            if global_player:
-                local_player = await leaderboard.fetch_local_player(conn, ctx.event.guild_id, ctx.user.id)
+    if not summary.entries:
+        await ctx.respond("No records could be found! Please try again later.", ephemeral=True)
+        return
 
-                if not local_player:
-                    footer = EmbedFooter(
-                        f'⭐ Your Rank: Unranked | Global Rank: #{global_player.rank}'
-                    )
-                else:
-                    footer = EmbedFooter(
-                        f'⭐ Your Rank: #{local_player.rank} | Global Rank: #{global_player.rank}'
-                    )
+    msg = build_leaderboard_message(ctx, summary)
+    await ctx.update(embeds=msg.embeds, components=msg.components)
 
-        space = app_emojis.get_emoji('space').mention
+@router.button(LB_FIRST)
+@instrument
+async def on_leaderboard_first(ctx: MessageComponentContext, cid: CustomId):
+    await respond_leaderboard(ctx, 'first', cid)
 
-        fmt_entries = '\n'.join([
-            f"{space} **{e.rank}.**  <@{e.user_id}> - **{e.best_score}**"
-            for e in entries
-        ])
+@router.button(LB_BACK)
+@instrument
+async def on_leaderboard_back(ctx: MessageComponentContext, cid: CustomId):
+    await respond_leaderboard(ctx, 'back', cid)
 
-    finally:
-        await conn.close()
-
-    embed = Embed(
-        title='Leaderboard',
-        thumbnail=EmbedThumbnail('https://raw.githubusercontent.com/scurry-works/squirrel-stash/refs/heads/main/assets/bookie.png'),
-        description=fmt_entries,
-        footer=footer
-    )
+@router.button(LB_NEXT)
+@instrument
+async def on_leaderboard_next(ctx: MessageComponentContext, cid: CustomId):
+    await respond_leaderboard(ctx, 'next', cid)
 
-    await ctx.respond(MessagePart(embeds=[embed]))
+@router.button(LB_LAST)
+@instrument
+async def on_leaderboard_last(ctx: MessageComponentContext, cid: CustomId):
+    await respond_leaderboard(ctx, 'last', cid)
 
-client.run()
+if __name__ == '__main__':
+    client.run()